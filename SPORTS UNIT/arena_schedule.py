@@ -0,0 +1,98 @@
+import bisect
+
+DAY_MINUTES = 24 * 60
+DEFAULT_DURATION = 60
+SLOT_MINUTES = 15
+
+
+def parse_time(value):
+    hours, _, minutes = value.strip().partition(":")
+    hours, minutes = int(hours), int(minutes or 0)
+    if not (0 <= hours <= 24 and 0 <= minutes < 60) or hours * 60 + minutes > DAY_MINUTES:
+        raise ValueError(f"Invalid time: {value}")
+    return hours * 60 + minutes
+
+
+def parse_time_range(value, default_duration=DEFAULT_DURATION):
+    # Accepts "HH:MM-HH:MM" or a bare "HH:MM" start time.
+    start_text, _, end_text = value.partition("-")
+    start = parse_time(start_text)
+    end = parse_time(end_text) if end_text else start + default_duration
+    if end <= start or end > DAY_MINUTES:
+        raise ValueError(f"Invalid time range: {value}")
+    return start, end
+
+
+def slot_mask(start, end):
+    # Bitmask of the 15 minute slots touched by [start, end)
+    first = start // SLOT_MINUTES
+    last = -(-end // SLOT_MINUTES)
+    return ((1 << (last - first)) - 1) << first
+
+
+def format_time(minutes):
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def format_time_range(start, end):
+    return f"{format_time(start)}-{format_time(end)}"
+
+
+class ArenaSchedule:
+    # For every (arena, date) the booked slots are kept as a sorted list of
+    # (start, end) minute pairs. Booked slots never overlap, so sorting by
+    # start also sorts by end and a single bisect finds any clash.
+    # masks mirrors slots as a bitmap of booked 15 minute slots per day, used
+    # by the availability queries.
+    def __init__(self):
+        self.slots = {}
+        self.masks = {}
+
+    def find_conflict(self, arena, date, start, end):
+        slots = self.slots.get((arena, date))
+        if not slots:
+            return None
+        index = bisect.bisect_left(slots, (end,))
+        if index and slots[index - 1][1] > start:
+            return slots[index - 1]
+        return None
+
+    def book(self, arena, date, time_range):
+        start, end = parse_time_range(time_range)
+        conflict = self.find_conflict(arena, date, start, end)
+        if conflict:
+            raise ValueError(f"{arena} is already booked on {date} from {format_time_range(*conflict)}")
+        bisect.insort(self.slots.setdefault((arena, date), []), (start, end))
+        self.masks[(arena, date)] = self.masks.get((arena, date), 0) | slot_mask(start, end)
+        return start, end
+
+    def cancel(self, arena, date, time_range):
+        start, end = parse_time_range(time_range)
+        slots = self.slots.get((arena, date), [])
+        index = bisect.bisect_left(slots, (start, end))
+        if index < len(slots) and slots[index] == (start, end):
+            del slots[index]
+            if not slots:
+                del self.slots[(arena, date)]
+                del self.masks[(arena, date)]
+            else:
+                # Neighbours may share a partly used slot, so rebuild this day only
+                mask = 0
+                for slot_start, slot_end in slots:
+                    mask |= slot_mask(slot_start, slot_end)
+                self.masks[(arena, date)] = mask
+            return True
+        return False
+
+    def next_free_slot(self, arena, date, duration, after=0, day_end=DAY_MINUTES):
+        slots = self.slots.get((arena, date), [])
+        start = after
+        index = bisect.bisect_right(slots, (start, DAY_MINUTES + 1))
+        if index and slots[index - 1][1] > start:
+            start = slots[index - 1][1]
+        while index < len(slots) and slots[index][0] < start + duration:
+            start = max(start, slots[index][1])
+            index += 1
+        if start + duration > day_end:
+            return None
+        return start, start + duration
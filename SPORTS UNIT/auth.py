@@ -0,0 +1,167 @@
+import base64
+import csv
+import hashlib
+import hmac
+import os
+import sqlite3
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# User accounts: one row per username (UNIQUE index), passwords stored as
+# salted PBKDF2-SHA256 hashes:
+#
+#   pbkdf2_sha256$<iterations>$<salt, base64>$<hash, base64>
+#
+# ITERATIONS is the work factor. Rows from before hashing (plain text) or
+# with fewer iterations still verify, and verify_user() hands back a fresh
+# hash so the caller can upgrade the row.
+# Key derivation takes a noticeable fraction of a second on purpose, so GUIs
+# should run verify_user()/set_user() off the Tk thread.
+
+SCHEME = 'pbkdf2_sha256'
+ITERATIONS = int(os.environ.get('SPORTS_PASSWORD_ITERATIONS', 600_000))
+SALT_BYTES = 16
+DEFAULT_ROLE = 'student'
+
+
+def create_users_index(db):
+    # Older databases have the same username on several rows (create_user
+    # used to insert one per launch). Keep the newest row of each user.
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_users_username'").fetchone()
+    if exists:
+        return
+    with db:
+        db.execute('''
+            DELETE FROM users WHERE id NOT IN (SELECT MAX(id) FROM users GROUP BY username)
+        ''')
+        db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_users_username ON users (username)')
+
+
+def encode(data):
+    return base64.b64encode(data).decode('ascii')
+
+
+def hash_password(password, iterations=None, salt=None):
+    iterations = iterations or ITERATIONS
+    salt = salt or os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return f"{SCHEME}${iterations}${encode(salt)}${encode(digest)}"
+
+
+def check_password(password, stored):
+    # Returns (matches, needs_rehash)
+    parts = stored.split('$')
+    if len(parts) != 4 or parts[0] != SCHEME:
+        # plain text from before hashing
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8')), True
+    iterations, salt, expected = int(parts[1]), base64.b64decode(parts[2]), base64.b64decode(parts[3])
+    digest = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations)
+    return hmac.compare_digest(digest, expected), iterations < ITERATIONS
+
+
+# Compared against when the username doesn't exist, so a wrong username
+# takes as long as a wrong password
+DUMMY_HASH = None
+
+
+def verify_user(username, password, db):
+    # Read only. Returns (role, new_hash): role is None if the login is wrong,
+    # new_hash is set when the stored hash should be upgraded with store_hash().
+    global DUMMY_HASH
+    row = db.execute('SELECT password, role FROM users WHERE username = ?', (username,)).fetchone()
+    if row is None:
+        if DUMMY_HASH is None:
+            DUMMY_HASH = hash_password('')
+        check_password(password, DUMMY_HASH)
+        return None, None
+
+    stored, role = row
+    matches, needs_rehash = check_password(password, stored)
+    if not matches:
+        return None, None
+    return role, hash_password(password) if needs_rehash else None
+
+
+def store_hash(username, password_hash, db):
+    db.execute('UPDATE users SET password = ? WHERE username = ?', (password_hash, username))
+    db.commit()
+
+
+def authenticate(username, password, db):
+    # verify_user + upgrade in one go, for scripts
+    role, new_hash = verify_user(username, password, db)
+    if new_hash:
+        store_hash(username, new_hash, db)
+    return role
+
+
+UPSERT_USER = '''
+    INSERT INTO users (username, password, role) VALUES (?, ?, ?)
+    ON CONFLICT (username) DO UPDATE SET password = excluded.password, role = excluded.role
+'''
+
+
+def set_user(username, password, role, db):
+    # Creates the user or replaces their password and role
+    save_user(username, hash_password(password), role, db)
+
+
+def save_user(username, password_hash, role, db):
+    # Same as set_user with the hash already computed, so a write
+    # transaction doesn't wait on the key derivation
+    db.execute(UPSERT_USER, (username, password_hash, role or DEFAULT_ROLE))
+    db.commit()
+
+
+def user_exists(username, db):
+    return db.execute('SELECT 1 FROM users WHERE username = ?', (username,)).fetchone() is not None
+
+
+def ensure_user(username, password, role, db):
+    # Only creates the account if it isn't there yet, leaves a changed password alone
+    if user_exists(username, db):
+        return False
+    return add_user(username, hash_password(password), role, db)
+
+
+def add_user(username, password_hash, role, db):
+    # Inserts the account unless the username is taken, True if it was added
+    added = db.execute('''
+        INSERT INTO users (username, password, role) VALUES (?, ?, ?) ON CONFLICT (username) DO NOTHING
+    ''', (username, password_hash, role or DEFAULT_ROLE)).rowcount == 1
+    db.commit()
+    return added
+
+
+def import_users(rows, db, iterations=None, workers=None):
+    # rows: (username, password, role) tuples. pbkdf2_hmac releases the GIL,
+    # so the hashes are computed on several threads, then everything is
+    # written with one executemany in a single transaction.
+    # A lower `iterations` makes large imports quick; those hashes are
+    # upgraded to ITERATIONS the first time each user logs in.
+    rows = [(username, password, role or DEFAULT_ROLE) for username, password, role in rows]
+    with ThreadPoolExecutor(workers or os.cpu_count() or 1) as pool:
+        hashes = list(pool.map(lambda row: hash_password(row[1], iterations), rows))
+    with db:
+        db.executemany(UPSERT_USER, [(username, password_hash, role)
+                                     for (username, _, role), password_hash in zip(rows, hashes)])
+    return len(rows)
+
+
+def read_users_file(path):
+    # CSV with a username,password,role header
+    with open(path, newline='', encoding='utf-8') as file:
+        for record in csv.DictReader(file):
+            yield record['username'], record['password'], record.get('role') or DEFAULT_ROLE
+
+
+if __name__ == '__main__':
+    # python auth.py users.csv [sports_inventory.db]
+    import inventory
+
+    csv_path = sys.argv[1]
+    db_path = sys.argv[2] if len(sys.argv) > 2 else inventory.DATABASE
+    conn = sqlite3.connect(db_path)
+    inventory.create_tables(conn)
+    print(f"Imported {import_users(read_users_file(csv_path), conn)} users")
+    conn.close()
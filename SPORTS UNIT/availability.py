@@ -0,0 +1,64 @@
+import datetime
+
+from arena_schedule import SLOT_MINUTES, slot_mask
+
+# Bookable hours shown in the week view and searched by find_free_slots
+OPEN_MINUTE = 8 * 60
+CLOSE_MINUTE = 22 * 60
+
+
+def as_date(value):
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    return value
+
+
+def date_range(start_date, end_date):
+    for day in range(as_date(start_date).toordinal(), as_date(end_date).toordinal() + 1):
+        yield datetime.date.fromordinal(day).isoformat()
+
+
+def run_starts(free, length):
+    # Bit i of the result is set when slots i .. i+length-1 are all free.
+    # Doubling the window each step needs log2(length) shifts.
+    runs, width = free, 1
+    while width < length:
+        step = min(width, length - width)
+        runs &= runs >> step
+        width += step
+    return runs
+
+
+def find_free_slots(schedule, arena, start_date, end_date, duration,
+                    open_minute=OPEN_MINUTE, close_minute=CLOSE_MINUTE, limit=None):
+    # Every (date, start, end) in the range where `duration` minutes are free,
+    # on the 15 minute grid, worked out from the schedule's bitmaps.
+    if duration <= 0 or duration % SLOT_MINUTES:
+        raise ValueError(f"Duration must be a positive multiple of {SLOT_MINUTES} minutes")
+    length = duration // SLOT_MINUTES
+    open_mask = slot_mask(open_minute, close_minute)
+    found = []
+    for date in date_range(start_date, end_date):
+        starts = run_starts(open_mask & ~schedule.masks.get((arena, date), 0), length)
+        while starts:
+            low_bit = starts & -starts
+            start = (low_bit.bit_length() - 1) * SLOT_MINUTES
+            found.append((date, start, start + duration))
+            if limit and len(found) >= limit:
+                return found
+            starts ^= low_bit
+    return found
+
+
+def week_matrix(schedule, arenas, start_date, days=7, open_minute=OPEN_MINUTE, close_minute=CLOSE_MINUTE):
+    # {(arena, date): [True if the slot is free, ...]} for the slots between opening and closing
+    first = open_minute // SLOT_MINUTES
+    count = (close_minute - open_minute) // SLOT_MINUTES
+    start_date = as_date(start_date)
+    end_date = start_date + datetime.timedelta(days=days - 1)
+    matrix = {}
+    for date in date_range(start_date, end_date):
+        for arena in arenas:
+            booked = schedule.masks.get((arena, date), 0) >> first
+            matrix[(arena, date)] = [not (booked >> slot) & 1 for slot in range(count)]
+    return matrix
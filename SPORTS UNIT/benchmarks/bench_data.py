@@ -0,0 +1,276 @@
+# Headless benchmarks for the data layer: the inventory.py CRUD functions, the
+# booking store / schedule used by booking.py, and TaskTracker.
+# For every dataset size a fresh database (and tracker) is filled with
+# synthetic rows, then each operation is timed call by call. Peak memory is
+# taken from one extra call under tracemalloc, so tracing doesn't slow down
+# the timed calls.
+#
+# Usage: python benchmarks/bench_data.py [--sizes 1000 100000 1000000] [--ops 200] [--output results.json]
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import auth
+import inventory
+
+ARENAS = ["Unit Sukan", "Football Field", "Tennis Court", "Badminton Court", "Mini Stadium"]
+SPORTS = ["Football", "Tennis", "Badminton", "Basketball", "Rugby", "Hockey", "Volleyball", "Netball"]
+ITEMS = ["Ball", "Racket", "Net", "Shoes", "Cones", "Stick", "Shirt", "Helmet", "Shuttlecock", "Bag"]
+PRIORITIES = ["low", "medium", "high"]
+SEED_BATCH = 50_000
+FIRST_DAY = datetime.date(2020, 1, 1)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run_case(name, size, function, calls):
+    # calls: one argument tuple per timed call, plus one more for the memory pass.
+    # Returns None when there is nothing to time (e.g. a tiny --sizes value).
+    if len(calls) < 2:
+        return None
+    latencies = []
+    started = time.perf_counter()
+    for args in calls[:-1]:
+        call_started = time.perf_counter()
+        function(*args)
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    function(*calls[-1])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'name': name,
+        'size': size,
+        'calls': len(latencies),
+        'seconds': round(elapsed, 4),
+        'calls_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'p50': round(statistics.median(latencies) * 1000, 4),
+            'p95': round(percentile(latencies, 0.95) * 1000, 4),
+            'p99': round(percentile(latencies, 0.99) * 1000, 4),
+            'max': round(max(latencies) * 1000, 4),
+        },
+        'peak_memory_bytes': peak,
+    }
+
+
+def equipment_rows(rng, count):
+    for _ in range(count):
+        item = rng.choice(ITEMS)
+        yield (f"{item} {rng.randrange(1000)}", item, rng.randrange(50), rng.choice(SPORTS), round(rng.uniform(1, 500), 2))
+
+
+def seed(insert_many, rows, batch=SEED_BATCH):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == batch:
+            insert_many(chunk)
+            chunk = []
+    if chunk:
+        insert_many(chunk)
+
+
+def bulk_insert(db, sql):
+    def insert_many(chunk):
+        with db:
+            db.executemany(sql, chunk)
+    return insert_many
+
+
+def booking_slots(count):
+    # 12 one hour slots a day in every arena, day after day
+    per_day = 12 * len(ARENAS)
+    for i in range(count):
+        day, slot = divmod(i, per_day)
+        hour, arena = divmod(slot, len(ARENAS))
+        start = (8 + hour) * 60
+        yield ARENAS[arena], (FIRST_DAY + datetime.timedelta(days=day)).isoformat(), start, start + 60
+
+
+def bench_equipment(db, size, ops, rng):
+    seed(lambda chunk: inventory.create_equipment_many(chunk, db=db), equipment_rows(rng, size))
+    ids = [row[0] for row in db.execute('SELECT id FROM sports_equipment')]
+    # split evenly, so a table smaller than 2 * (ops + 1) still has rows for both
+    picked = rng.sample(ids, min(len(ids), 2 * (ops + 1)))
+    to_update, to_delete = picked[:len(picked) // 2], picked[len(picked) // 2:]
+    scans = max(2, min(ops, 10 if size < 1_000_000 else 3))
+
+    return [
+        run_case('inventory.create_equipment', size, lambda *row: inventory.create_equipment(*row, db=db),
+                 list(equipment_rows(rng, ops + 1))),
+        run_case('inventory.read_all_equipment[admin]', size, lambda: inventory.read_all_equipment('admin', db=db),
+                 [()] * (scans + 1)),
+        run_case('inventory.read_all_equipment[student]', size, lambda: inventory.read_all_equipment('student', db=db),
+                 [()] * (scans + 1)),
+        run_case('inventory.read_equipment_page', size, lambda after_id: inventory.read_equipment_page(after_id, db=db),
+                 [(rng.choice(ids),) for _ in range(ops + 1)]),
+        run_case('inventory.search_equipment[text]', size, lambda text: inventory.search_equipment(text=text, db=db),
+                 [(rng.choice(ITEMS),) for _ in range(ops + 1)]),
+        run_case('inventory.update_equipment', size,
+                 lambda equipment_id: inventory.update_equipment(equipment_id, 'Renamed', rng.choice(ITEMS), rng.randrange(50),
+                                                            rng.choice(SPORTS), round(rng.uniform(1, 500), 2), db=db),
+                 [(equipment_id,) for equipment_id in to_update]),
+        run_case('inventory.delete_equipment', size, lambda equipment_id: inventory.delete_equipment(equipment_id, db=db),
+                 [(equipment_id,) for equipment_id in to_delete]),
+    ]
+
+
+def bench_users(db, size, ops, rng):
+    seed(bulk_insert(db, 'INSERT INTO users (username, password, role) VALUES (?, ?, ?)'),
+         ((f"user{i}", 'secret', 'student') for i in range(size)))
+    calls = [(f"new{i}", 'secret', 'student') for i in range(ops // 2 + 1)]
+    calls += [(f"user{rng.randrange(size)}", 'changed', 'staff') for _ in range(ops - ops // 2)]
+    rng.shuffle(calls)
+    return [run_case('inventory.create_user', size, lambda *user: inventory.create_user(*user, db=db), calls)]
+
+
+def bench_bookings(db, size, ops, rng):
+    import booking_store
+    from arena_schedule import ArenaSchedule, format_time_range
+    from availability import find_free_slots
+
+    booking_store.create_bookings_table(db)
+    seed(bulk_insert(db, 'INSERT INTO bookings (arena, date, start_minute, end_minute) VALUES (?, ?, ?, ?)'),
+         booking_slots(size))
+    days = max(1, size // (12 * len(ARENAS)))
+
+    def random_day():
+        return (FIRST_DAY + datetime.timedelta(days=rng.randrange(days))).isoformat()
+
+    def try_booking(arena, date, start):
+        try:
+            booking_store.add_booking(db, arena, date, start, start + 30)
+        except ValueError:
+            pass  # about half of them clash, that's part of what is measured
+
+    schedule = ArenaSchedule()
+    for arena, date, start, end in booking_slots(size):
+        schedule.book(arena, date, format_time_range(start, end))
+
+    def try_schedule(arena, date, start):
+        try:
+            schedule.book(arena, date, format_time_range(start, start + 30))
+        except ValueError:
+            pass
+
+    slot_calls = [(rng.choice(ARENAS), random_day(), rng.choice([7, 8, 20, 21]) * 60) for _ in range(ops + 1)]
+    return [
+        run_case('booking_store.add_booking', size, try_booking, slot_calls),
+        run_case('booking_store.read_bookings[arena, week]', size,
+                 lambda arena, date: booking_store.read_bookings(
+                     db, arena, date, (datetime.date.fromisoformat(date) + datetime.timedelta(days=6)).isoformat()),
+                 [(rng.choice(ARENAS), random_day()) for _ in range(ops + 1)]),
+        run_case('ArenaSchedule.book', size, try_schedule, slot_calls),
+        run_case('availability.find_free_slots[week]', size,
+                 lambda arena, date: find_free_slots(
+                     schedule, arena, date, (datetime.date.fromisoformat(date) + datetime.timedelta(days=6)).isoformat(), 60),
+                 [(rng.choice(ARENAS), random_day()) for _ in range(ops + 1)]),
+    ]
+
+
+def bench_tasks(size, ops, rng):
+    from task_tracker import TaskTracker
+
+    tracker = TaskTracker()
+    # Zero padded titles and rising due dates keep the sorted indexes appending at the end
+    for i in range(size):
+        tracker.add_task(f"Task {i:07d}", f"Check the {ITEMS[i % len(ITEMS)]}",
+                         FIRST_DAY + datetime.timedelta(days=i // 100), PRIORITIES[i % 3])
+
+    def random_due():
+        return FIRST_DAY + datetime.timedelta(days=rng.randrange(size // 100 + 1))
+
+    return [
+        run_case('TaskTracker.add_task', size, tracker.add_task,
+                 [(f"New task {i}", "Book the tennis court", random_due(), rng.choice(PRIORITIES)) for i in range(ops + 1)]),
+        run_case('TaskTracker.search_tasks', size, tracker.search_tasks,
+                 [(f"check {rng.choice(ITEMS)[:3]}",) for _ in range(ops + 1)]),
+        run_case('TaskTracker.filter_tasks_due_date[week]', size,
+                 lambda start: tracker.filter_tasks_due_date(start, start + datetime.timedelta(days=6)),
+                 [(random_due(),) for _ in range(ops + 1)]),
+        run_case('TaskTracker.mark_task_complete', size, tracker.mark_task_complete,
+                 [(f"Task {rng.randrange(size):07d}",) for _ in range(ops + 1)]),
+        run_case('TaskTracker.get_task_statistics', size, tracker.get_task_statistics, [()] * (ops + 1)),
+        run_case('TaskTracker.delete_task', size, tracker.delete_task,
+                 [(f"New task {i}",) for i in range(ops + 1)]),
+    ]
+
+
+def run_size(size, ops, workdir):
+    rng = random.Random(size)
+    db = sqlite3.connect(os.path.join(workdir, f"bench_{size}.db"))
+    inventory.create_tables(db)
+
+    results = []
+    for name, bench in [('equipment', lambda: bench_equipment(db, size, ops, rng)),
+                        ('users', lambda: bench_users(db, size, ops, rng)),
+                        ('bookings', lambda: bench_bookings(db, size, ops, rng)),
+                        ('tasks', lambda: bench_tasks(size, ops, rng))]:
+        started = time.perf_counter()
+        cases = bench()
+        print(f"{size:>9} {name:10} {time.perf_counter() - started:8.1f}s", file=sys.stderr)
+        results.extend(case for case in cases if case is not None)
+    db.close()
+    return results
+
+
+def main(args):
+    workdir = tempfile.mkdtemp(prefix='bench_data_')
+    # create_user derives a password hash, at the real work factor that cost
+    # hides everything else
+    auth.ITERATIONS = args.password_iterations
+
+    results = []
+    for size in args.sizes:
+        results.extend(run_size(size, args.ops, workdir))
+
+    report = {
+        'started': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'sizes': args.sizes,
+        'ops': args.ops,
+        'password_iterations': args.password_iterations,
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        'results': results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the equipment, booking and task data layer")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000],
+                        help="dataset sizes (rows per table)")
+    parser.add_argument('--ops', type=int, default=200, help="timed calls per operation")
+    parser.add_argument('--password-iterations', type=int, default=1000,
+                        help=f"PBKDF2 work factor for create_user (the app uses {auth.ITERATIONS})")
+    parser.add_argument('--output', help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    if args.output:
+        args.output = os.path.abspath(args.output)
+    main(args)
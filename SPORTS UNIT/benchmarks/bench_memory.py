@@ -0,0 +1,79 @@
+# Compares the memory used by the old booking/task layouts with the compact ones.
+# Usage: python benchmarks/bench_memory.py [count]
+import datetime
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_records import Booking, EventColumns
+from task_tracker import Task
+
+ARENAS = ["Unit Sukan", "Football Field", "Tennis Court", "Badminton Court", "Mini Stadium"]
+
+
+class DictTask:
+    # The Task layout before __slots__
+    def __init__(self, title, description, due_date, priority):
+        self.title = title
+        self.description = description
+        self.due_date = due_date
+        self.priority = priority
+        self.completed = False
+
+
+def sample_rows(count):
+    first_day = datetime.date(2024, 1, 1).toordinal()
+    for i in range(count):
+        start = 8 * 60 + (i % 12) * 60
+        yield first_day + i // 60, start, start + 60, ARENAS[i % len(ARENAS)]
+
+
+def dict_events(count):
+    return [{"Date": datetime.date.fromordinal(day).isoformat(),
+             "Time": f"{start // 60:02d}:00-{end // 60:02d}:00",
+             "Arena": arena} for day, start, end, arena in sample_rows(count)]
+
+
+def slot_events(count):
+    codes = {arena: code for code, arena in enumerate(ARENAS)}
+    return [Booking(day, start, end, codes[arena]) for day, start, end, arena in sample_rows(count)]
+
+
+def column_events(count):
+    events = EventColumns()
+    for day, start, end, arena in sample_rows(count):
+        events.append(datetime.date.fromordinal(day), start, end, arena)
+    return events
+
+
+def tasks(task_class, count):
+    due = datetime.date(2024, 1, 1)
+    return [task_class(f"Task {i}", "Check the equipment", due, "medium") for i in range(count)]
+
+
+def measure(build, count):
+    tracemalloc.start()
+    data = build(count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del data
+    return current
+
+
+def main(count=100_000):
+    results = [
+        ("events: list of dicts", measure(dict_events, count)),
+        ("events: Booking __slots__", measure(slot_events, count)),
+        ("events: EventColumns arrays", measure(column_events, count)),
+        ("tasks: plain class", measure(lambda n: tasks(DictTask, n), count)),
+        ("tasks: Task __slots__", measure(lambda n: tasks(Task, n), count)),
+    ]
+    print(f"{count} records")
+    for name, size in results:
+        print(f"{name:30} {size / 1024 / 1024:8.2f} MiB  {size / count:7.1f} bytes/record")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
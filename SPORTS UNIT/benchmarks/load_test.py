@@ -0,0 +1,138 @@
+# Load test for server.py: many concurrent keep-alive clients mixing booking
+# reads, booking attempts (many of them clashing) and equipment reads.
+# Starts its own server on a temporary database unless --url is given.
+#
+# Usage: python benchmarks/load_test.py [--clients 200] [--requests 20] [--url http://127.0.0.1:8765]
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ARENAS = ["Unit Sukan", "Football Field", "Tennis Court", "Badminton Court", "Mini Stadium"]
+
+
+async def call(reader, writer, host, method, path, body=None):
+    data = json.dumps(body).encode() if body is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode() + data)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    payload = await reader.readexactly(length) if length else b''
+    return status, json.loads(payload) if payload else None
+
+
+def random_request(rng, first_day, days):
+    date = (first_day + datetime.timedelta(days=rng.randrange(days))).isoformat()
+    pick = rng.random()
+    if pick < 0.4:
+        return 'GET', f"/bookings?start_date={date}&end_date={date}", None
+    if pick < 0.8:
+        hour = rng.randrange(8, 21)
+        return 'POST', '/bookings', {'arena': rng.choice(ARENAS), 'date': date, 'time': f"{hour:02d}:00-{hour + 1:02d}:00"}
+    return 'GET', '/equipment?limit=50', None
+
+
+async def run_client(host, port, requests, seed, first_day, days, latencies, statuses):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for _ in range(requests):
+            method, path, body = random_request(rng, first_day, days)
+            started = time.perf_counter()
+            status, _ = await call(reader, writer, host, method, path, body)
+            latencies.append(time.perf_counter() - started)
+            statuses[f"{method} {status}"] = statuses.get(f"{method} {status}", 0) + 1
+    finally:
+        writer.close()
+        await writer.wait_closed()
+
+
+async def check_no_overlaps(host, port, first_day, days):
+    reader, writer = await asyncio.open_connection(host, port)
+    last_day = (first_day + datetime.timedelta(days=days - 1)).isoformat()
+    _, bookings = await call(reader, writer, host, 'GET', f"/bookings?start_date={first_day.isoformat()}&end_date={last_day}")
+    writer.close()
+    await writer.wait_closed()
+    seen = {}
+    for booking in bookings:
+        key = (booking['arena'], booking['date'])
+        for start, end in seen.get(key, []):
+            if booking['start_minute'] < end and start < booking['end_minute']:
+                return False, len(bookings)
+        seen.setdefault(key, []).append((booking['start_minute'], booking['end_minute']))
+    return True, len(bookings)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+async def main(args):
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        from server import BookingServer
+        database = os.path.join(tempfile.mkdtemp(), 'load_test.db')
+        server = BookingServer(database)
+        host, port = await server.start('127.0.0.1', 0)
+
+    first_day = datetime.date.today() + datetime.timedelta(days=365)
+    latencies = []
+    statuses = {}
+    started = time.perf_counter()
+    await asyncio.gather(*(run_client(host, port, args.requests, seed, first_day, args.days, latencies, statuses)
+                           for seed in range(args.clients)))
+    elapsed = time.perf_counter() - started
+    no_overlaps, booked = await check_no_overlaps(host, port, first_day, args.days)
+
+    if server:
+        await asyncio.sleep(0.1)  # let the server see the clients hang up
+        await server.close()
+
+    print(json.dumps({
+        'clients': args.clients,
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(statistics.median(latencies) * 1000, 2),
+            'p95': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99': round(percentile(latencies, 0.99) * 1000, 2),
+            'max': round(max(latencies) * 1000, 2),
+        },
+        'statuses': dict(sorted(statuses.items())),
+        'bookings': booked,
+        'no_overlapping_bookings': no_overlaps,
+    }, indent=2))
+    return no_overlaps
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Concurrent load test for server.py")
+    parser.add_argument('--url', help="test a running server instead of starting one")
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--requests', type=int, default=20, help="requests per client")
+    parser.add_argument('--days', type=int, default=3, help="spread bookings over this many days")
+    ok = asyncio.run(main(parser.parse_args()))
+    sys.exit(0 if ok else 1)
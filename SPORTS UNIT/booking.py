@@ -1,186 +1,189 @@
 import tkinter as tk
 from tkinter import messagebox
 import datetime
-import csv
-
-class Task:
-    def init(self, title, description, due_date, priority):
-        self.title = title
-        self.description = description
-        self.due_date = due_date
-        self.priority = priority
-        self.completed = False
-
-class TaskTracker:
-    def init(self):
-        self.tasks = []
-
-    def add_task(self, title, description, due_date, priority):
-        task = Task(title, description, due_date, priority)
-        self.tasks.append(task)
-
-    def list_tasks(self):
-        for task in self.tasks:
-            completed_status = "Completed" if task.completed else "Incomplete"
-            print(f"Title: {task.title}")
-            print(f"Description: {task.description}")
-            print(f"Due Date: {task.due_date}")
-            print(f"Priority: {task.priority}")
-            print(f"Status: {completed_status}")
-            print()
-
-    def mark_task_complete(self, title):
-        for task in self.tasks:
-            if task.title == title:
-                task.completed = True
-                break
-
-    def delete_task(self, title):
-        for task in self.tasks:
-            if task.title == title:
-                self.tasks.remove(task)
-                break
-
-    def search_tasks(self, keyword):
-        matched_tasks = []
-        for task in self.tasks:
-            if keyword.lower() in task.title.lower() or keyword.lower() in task.description.lower():
-                matched_tasks.append(task)
-        return matched_tasks
-
-    def filter_tasks_due_date(self, start_date, end_date):
-        filtered_tasks = []
-        for task in self.tasks:
-            if start_date <= task.due_date <= end_date:
-                filtered_tasks.append(task)
-        return filtered_tasks
-
-    def sort_tasks_by_priority(self):
-        self.tasks.sort(key=lambda task: task.priority)
-
-    def get_task_statistics(self):
-        total_tasks = len(self.tasks)
-        completed_tasks = sum(task.completed for task in self.tasks)
-        current_date = datetime.datetime.now().date()
-        tasks_due_within_week = sum(task.due_date <= current_date + datetime.timedelta(days=7) for task in self.tasks)
-
-        return total_tasks, completed_tasks, tasks_due_within_week
-
-def validate_date(date_str):
-    try:
-        datetime.datetime.strptime(date_str, "%Y-%m-%d")
-        return True
-    except ValueError:
-        return False
-
-def validate_priority(priority):
-    return priority.lower() in ["low", "medium", "high"]
-
-def clear_console():
-    print("\033c", end="")
-
-def display_menu():
-    print("Task Tracker Menu:")
-    print("1. Add Task")
-    print("2. List Tasks")
-    print("3. Mark Task as Complete")
-    print("4. Delete Task")
-    print("5. Search and Filter Tasks")
-    print("6. Sort Tasks by Priority")
-    print("7. Display Task Statistics")
-    print("8. Exit")
-
-def display_error(message):
-    print(f"Error: {message}\n")
-
-def display_success(message):
-    print(f"Success: {message}\n")
-
-def display_tasks(tasks):
-    if not tasks:
-        print("No tasks found.")
-    else:
-        for task in tasks:
-            completed_status = "Completed" if task.completed else "Incomplete"
-            print(f"Title: {task.title}")
-            print(f"Description: {task.description}")
-            print(f"Due Date: {task.due_date}")
-            print(f"Priority: {task.priority}")
-            print(f"Status: {completed_status}")
-            print()
+import os
+import sqlite3
+import reservations
+from arena_schedule import format_time_range
+from availability import OPEN_MINUTE, CLOSE_MINUTE, SLOT_MINUTES
+from booking_core import ARENAS, BookingCalendar, open_store, validate_date, format_event
+from recurrence import RecurrenceRule, parse_dates
+
+# Tk window for arena bookings, the booking logic lives in booking_core.py
 
 def book_event():
     date = date_entry.get()
     time = time_entry.get()
     arena = arena_var.get()
 
+    try:
+        items = reservations.parse_items(equipment_entry.get())
+    except ValueError as error:
+        messagebox.showerror("Error", str(error))
+        return
+
+    iso_date = validate_date(date)
     if not date or not time or not arena:
         messagebox.showerror("Error", "Please fill in all fields")
+    elif iso_date is None:
+        messagebox.showerror("Error", "Date must be in YYYY-MM-DD format")
+    elif repeat_entry.get().strip():
+        book_series(arena, iso_date, time, items)
     else:
-        event = {"Date": date, "Time": time, "Arena": arena}
-        events.append(event)
-        save_events()
+        try:
+            index = calendar.book(arena, iso_date, time, items)
+        except (ValueError, OSError, RuntimeError, sqlite3.Error) as error:
+            # a clash (with the next free slot), missing stock, or the server couldn't be reached
+            messagebox.showerror("Error", str(error))
+            return
+        if index is not None:
+            events_list.insert(index, format_event(calendar.events[index]))
         messagebox.showinfo("Success", "Event booked successfully")
         clear_fields()
 
+def book_series(arena, date, time, items):
+    if items:
+        messagebox.showerror("Error", "Equipment can only be reserved for single bookings")
+        return
+    try:
+        rule = RecurrenceRule(date, until_entry.get().strip(), int(repeat_entry.get()),
+                              parse_dates(except_entry.get()))
+    except ValueError as error:
+        messagebox.showerror("Error", f"Invalid repeat settings: {error}")
+        return
+    try:
+        positions = calendar.book_series(arena, rule, time)
+    except (ValueError, OSError, RuntimeError, sqlite3.Error) as error:
+        messagebox.showerror("Error", str(error))
+        return
+    for index in positions:
+        events_list.insert(index, format_event(calendar.events[index]))
+    messagebox.showinfo("Success", f"Booked {len(rule.dates())} dates")
+    clear_fields()
+
+# Week view: one row per arena per day, one cell per 15 minutes, green = free
+CELL_WIDTH = 8
+CELL_HEIGHT = 12
+LABEL_WIDTH = 170
+
+def show_week_view():
+    date = validate_date(date_entry.get())
+    start_date = datetime.date.fromisoformat(date) if date else datetime.date.today()
+    matrix = calendar.week(start_date, arena_choices)
+
+    slot_count = (CLOSE_MINUTE - OPEN_MINUTE) // SLOT_MINUTES
+    rows = list(matrix)
+
+    week_window = tk.Toplevel(window)
+    week_window.title(f"Availability from {start_date.isoformat()}")
+    canvas = tk.Canvas(week_window, width=LABEL_WIDTH + slot_count * CELL_WIDTH + 10,
+                       height=(len(rows) + 1) * CELL_HEIGHT + 10, bg="white")
+    canvas.pack()
+
+    for slot in range(0, slot_count, 60 // SLOT_MINUTES):
+        canvas.create_text(LABEL_WIDTH + slot * CELL_WIDTH, 2, anchor="nw", font=("Arial", 7),
+                           text=str((OPEN_MINUTE + slot * SLOT_MINUTES) // 60))
+
+    for row, (arena, date) in enumerate(rows):
+        top = (row + 1) * CELL_HEIGHT
+        canvas.create_text(2, top, anchor="nw", font=("Arial", 7), text=f"{date}  {arena}")
+        for slot, free in enumerate(matrix[(arena, date)]):
+            left = LABEL_WIDTH + slot * CELL_WIDTH
+            canvas.create_rectangle(left, top, left + CELL_WIDTH, top + CELL_HEIGHT - 2,
+                                    fill="palegreen" if free else "tomato", outline="white")
+
+    def pick_slot(click):
+        # Clicking a cell fills in the booking form
+        row = click.y // CELL_HEIGHT - 1
+        slot = (click.x - LABEL_WIDTH) // CELL_WIDTH
+        if not (0 <= row < len(rows) and 0 <= slot < slot_count):
+            return
+        arena, date = rows[row]
+        start = OPEN_MINUTE + slot * SLOT_MINUTES
+        date_entry.delete(0, tk.END)
+        date_entry.insert(0, date)
+        time_entry.delete(0, tk.END)
+        time_entry.insert(0, format_time_range(start, min(start + 60, CLOSE_MINUTE)))
+        arena_var.set(arena)
+
+    canvas.bind("<Button-1>", pick_slot)
+
 def clear_fields():
     date_entry.delete(0, tk.END)
     time_entry.delete(0, tk.END)
+    equipment_entry.delete(0, tk.END)
+    repeat_entry.delete(0, tk.END)
+    until_entry.delete(0, tk.END)
+    except_entry.delete(0, tk.END)
     arena_var.set(arena_choices[0])
 
-def save_events():
-    with open("events.csv", "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=["Date", "Time", "Arena"])
-        writer.writeheader()
-        writer.writerows(events)
+def load_more_events():
+    for index in calendar.load_more_events():
+        events_list.insert(index, format_event(calendar.events[index]))
 
-def load_events():
-    try:
-        with open("events.csv", "r") as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                events.append(row)
-    except FileNotFoundError:
-        pass
-
-window = tk.Tk()
-window.title("Sport Arena Booking System")
-window.geometry("400x300")
-window.configure(bg="lightblue")
-
-date_label = tk.Label(window, text="Date (YYYY-MM-DD):")
-date_label.pack()
-date_entry = tk.Entry(window)
-date_entry.pack()
-
-time_label = tk.Label(window, text="Time (HH:MM):")
-time_label.pack()
-time_entry = tk.Entry(window)
-time_entry.pack()
-
-arena_label = tk.Label(window, text="Arena Type:")
-arena_label.pack()
-arena_var = tk.StringVar()
-arena_choices = ["Unit Sukan", "Football Field", "Tennis Court", "Badminton Court", "Mini Stadium"]
-arena_dropdown = tk.OptionMenu(window, arena_var, *arena_choices)
-arena_dropdown.pack()
-
-book_button = tk.Button(window, text="Book Event", command=book_event, width=20, height=2, bg="green", fg="white")
-book_button.pack()
-
-clear_button = tk.Button(window, text="Clear Fields", command=clear_fields, width=20, height=2)
-clear_button.pack()
-
-events = []
-load_events()
-
-events_label = tk.Label(window, text="Booked Events:")
-events_label.pack()
-
-events_textbox = tk.Text(window, height=8, width=40)
-events_textbox.pack()
-
-for event in events:
-    events_textbox.insert(tk.END, f"Date: {event['Date']}\nTime: {event['Time']}\nArena: {event['Arena']}\n\n")
-
-window.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    window = tk.Tk()
+    window.title("Sport Arena Booking System")
+    window.geometry("400x300")
+    window.configure(bg="lightblue")
+
+    date_label = tk.Label(window, text="Date (YYYY-MM-DD):")
+    date_label.pack()
+    date_entry = tk.Entry(window)
+    date_entry.pack()
+
+    time_label = tk.Label(window, text="Time (HH:MM-HH:MM):")
+    time_label.pack()
+    time_entry = tk.Entry(window)
+    time_entry.pack()
+
+    arena_label = tk.Label(window, text="Arena Type:")
+    arena_label.pack()
+    arena_var = tk.StringVar()
+    arena_choices = ARENAS
+    arena_dropdown = tk.OptionMenu(window, arena_var, *arena_choices)
+    arena_dropdown.pack()
+
+    equipment_label = tk.Label(window, text="Equipment (id:quantity, optional):")
+    equipment_label.pack()
+    equipment_entry = tk.Entry(window)
+    equipment_entry.pack()
+
+    repeat_label = tk.Label(window, text="Repeat every N days (optional, 7 = weekly):")
+    repeat_label.pack()
+    repeat_entry = tk.Entry(window)
+    repeat_entry.pack()
+
+    until_label = tk.Label(window, text="Repeat until (YYYY-MM-DD):")
+    until_label.pack()
+    until_entry = tk.Entry(window)
+    until_entry.pack()
+
+    except_label = tk.Label(window, text="Skip dates (YYYY-MM-DD, comma separated):")
+    except_label.pack()
+    except_entry = tk.Entry(window)
+    except_entry.pack()
+
+    book_button = tk.Button(window, text="Book Event", command=book_event, width=20, height=2, bg="green", fg="white")
+    book_button.pack()
+
+    clear_button = tk.Button(window, text="Clear Fields", command=clear_fields, width=20, height=2)
+    clear_button.pack()
+
+    week_button = tk.Button(window, text="Week View", command=show_week_view, width=20)
+    week_button.pack()
+
+    events_label = tk.Label(window, text="Upcoming Events:")
+    events_label.pack()
+
+    events_list = tk.Listbox(window, height=8, width=50)
+    events_list.pack()
+
+    more_button = tk.Button(window, text="Show more", command=load_more_events)
+    more_button.pack()
+
+    # SPORTS_SERVER_URL switches to the shared server.py, see open_store
+    calendar = BookingCalendar(*open_store(os.environ.get("SPORTS_SERVER_URL")))
+    load_more_events()
+
+    window.mainloop()
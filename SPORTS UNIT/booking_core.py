@@ -0,0 +1,199 @@
+import datetime
+
+import booking_store
+import inventory
+import reservations
+from task_tracker import PRIORITIES
+from arena_schedule import ArenaSchedule, parse_time_range, format_time_range
+from event_records import EventColumns
+from availability import SLOT_MINUTES, find_free_slots, week_matrix
+
+# Booking logic without any tkinter, booking.py is the window on top of it.
+# Nothing touches the database until open_store() is called.
+
+ARENAS = ["Unit Sukan", "Football Field", "Tennis Court", "Badminton Court", "Mini Stadium"]
+
+# Only bookings from today up to loaded_until are read at startup, older
+# history stays in the database. "Show more" extends the window.
+UPCOMING_DAYS = 14
+
+def validate_date(date_str):
+    # The date as YYYY-MM-DD ("2024-1-5" -> "2024-01-05"), None if it isn't one.
+    # Pass on the returned string, everything downstream expects that form.
+    try:
+        return booking_store.normalize_date(date_str)
+    except ValueError:
+        return None
+
+def validate_priority(priority):
+    return priority.lower() in PRIORITIES
+
+def clear_console():
+    print("\033c", end="")
+
+def display_menu():
+    print("Task Tracker Menu:")
+    print("1. Add Task")
+    print("2. List Tasks")
+    print("3. Mark Task as Complete")
+    print("4. Delete Task")
+    print("5. Search and Filter Tasks")
+    print("6. Sort Tasks by Priority")
+    print("7. Display Task Statistics")
+    print("8. Exit")
+
+def display_error(message):
+    print(f"Error: {message}\n")
+
+def display_success(message):
+    print(f"Success: {message}\n")
+
+def display_tasks(tasks):
+    if not tasks:
+        print("No tasks found.")
+    else:
+        for task in tasks:
+            completed_status = "Completed" if task.completed else "Incomplete"
+            print(f"Title: {task.title}")
+            print(f"Description: {task.description}")
+            print(f"Due Date: {task.due_date}")
+            print(f"Priority: {task.priority}")
+            print(f"Status: {completed_status}")
+            print()
+
+def open_store(server_url=None, database=booking_store.DATABASE):
+    # Returns (store, equipment_store, conn). With a server URL bookings go
+    # through server.py instead of the local database, so several people can
+    # book at the same time.
+    if server_url:
+        import client  # urllib.request is slow to import, only pay for it when used
+        return client, client, client.connect(server_url)
+
+    conn = booking_store.connect(database)
+    # Equipment reservations update sports_equipment, bring it up to date
+    # (version column) in case the inventory app never ran on this database
+    inventory.create_tables(conn)
+    reservations.create_reservations_table(conn)
+    # Give back equipment held by bookings that are over
+    reservations.release_finished(conn)
+
+    # First run against the database: pull in the old events.csv history
+    if not booking_store.has_bookings(conn):
+        booking_store.import_events_csv(conn)
+    return booking_store, reservations, conn
+
+def format_event(event):
+    return f"{event['Date']}  {event['Time']}  {event['Arena']}"
+
+
+class BookingCalendar:
+    # The bookings of the loaded window (events, in date order) plus the
+    # schedule used for conflict checks. Days outside the window that were
+    # needed for a check are indexed in the schedule only.
+    def __init__(self, store, equipment_store, conn, today=None):
+        self.store = store
+        self.equipment_store = equipment_store
+        self.conn = conn
+        self.events = EventColumns()
+        self.schedule = ArenaSchedule()
+        self.extra_loaded_dates = set()
+        self.window_start = today or datetime.date.today()
+        self.loaded_until = self.window_start - datetime.timedelta(days=1)
+
+    def index_booking(self, row):
+        try:
+            self.schedule.book(row[1], row[2], format_time_range(row[3], row[4]))
+        except ValueError:
+            pass  # overlapping rows from old imported history, the first one wins
+
+    def in_window(self, date):
+        return self.window_start.isoformat() <= date <= self.loaded_until.isoformat()
+
+    def load_more_events(self, days=UPCOMING_DAYS):
+        # Returns the positions the new events were inserted at, in order
+        start_date = self.loaded_until + datetime.timedelta(days=1)
+        self.loaded_until = self.loaded_until + datetime.timedelta(days=days)
+        # Dates already pulled in by ensure_date_loaded are in the schedule, not in the events
+        for day in range(start_date.toordinal(), self.loaded_until.toordinal() + 1):
+            self.extra_loaded_dates.discard(datetime.date.fromordinal(day).isoformat())
+
+        positions = []
+        for row in self.store.iter_bookings(self.conn, start_date=start_date.isoformat(),
+                                            end_date=self.loaded_until.isoformat()):
+            positions.append(self.events.insert_sorted(row[2], row[3], row[4], row[1]))
+            self.index_booking(row)
+        return positions
+
+    def ensure_date_loaded(self, date):
+        # Conflict checks for a date outside the loaded window need that day's bookings
+        if self.in_window(date) or date in self.extra_loaded_dates:
+            return
+        for row in self.store.iter_bookings(self.conn, start_date=date, end_date=date):
+            self.index_booking(row)
+        self.extra_loaded_dates.add(date)
+
+    def book(self, arena, date, time, items=()):
+        # Raises ValueError on a clash (with a suggestion) or missing stock,
+        # OSError/RuntimeError/sqlite3.Error if the store fails. Returns the
+        # position in events, or None when the date is outside the window.
+        date = booking_store.normalize_date(date)
+        self.ensure_date_loaded(date)
+        try:
+            start, end = self.schedule.book(arena, date, time)
+        except ValueError as error:
+            raise ValueError(f"{error}{self.suggest_slot(arena, date, time)}")
+        try:
+            if items:
+                self.equipment_store.book_with_equipment(self.conn, arena, date, start, end, items)
+            else:
+                self.store.add_booking(self.conn, arena, date, start, end)
+        except Exception:
+            # a clash or missing stock found by the store/server, or the server couldn't be reached
+            self.schedule.cancel(arena, date, format_time_range(start, end))
+            raise
+        if self.in_window(date):
+            return self.events.insert_sorted(date, start, end, arena)
+        return None
+
+    def book_series(self, arena, rule, time):
+        # Books every date of a RecurrenceRule in one checked write, raises
+        # ValueError listing the clashes. Returns the positions in events of
+        # the dates that fall inside the loaded window.
+        start, end = parse_time_range(time)
+        dates = rule.dates()
+        if not dates:
+            raise ValueError("The series has no dates left after the exceptions")
+        self.store.add_booking_series(self.conn, arena, dates, start, end)
+
+        positions = []
+        for date in dates:
+            if self.in_window(date) or date in self.extra_loaded_dates:
+                self.index_booking((None, arena, date, start, end))
+            if self.in_window(date):
+                positions.append(self.events.insert_sorted(date, start, end, arena))
+        return positions
+
+    def suggest_slot(self, arena, date, time):
+        try:
+            start, end = parse_time_range(time)
+        except ValueError:
+            return ""
+        slot = self.schedule.next_free_slot(arena, date, end - start, after=start)
+        if slot is not None:
+            return f"\nNext free slot: {format_time_range(*slot)}"
+        # Nothing left that day, look at the rest of the week
+        first_day = datetime.date.fromisoformat(date) + datetime.timedelta(days=1)
+        for day in range(7):
+            self.ensure_date_loaded((first_day + datetime.timedelta(days=day)).isoformat())
+        # searched in whole slots, the suggestion keeps the asked length
+        slots = -(-(end - start) // SLOT_MINUTES)
+        free = find_free_slots(self.schedule, arena, first_day, first_day + datetime.timedelta(days=6),
+                               slots * SLOT_MINUTES, limit=1)
+        if not free:
+            return ""
+        return f"\nNext free slot: {free[0][0]} {format_time_range(free[0][1], free[0][1] + end - start)}"
+
+    def week(self, start_date, arenas=ARENAS):
+        for day in range(7):
+            self.ensure_date_loaded((start_date + datetime.timedelta(days=day)).isoformat())
+        return week_matrix(self.schedule, arenas, start_date)
@@ -0,0 +1,234 @@
+import datetime
+import sqlite3
+import sys
+
+from arena_schedule import parse_time_range, format_time_range
+from event_log import load_events
+import export
+import stats
+
+DATABASE = 'sports_inventory.db'
+
+
+def connect(path=DATABASE):
+    conn = sqlite3.connect(path)
+    create_bookings_table(conn)
+    return conn
+
+
+def create_bookings_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS bookings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            arena TEXT NOT NULL,
+            date TEXT NOT NULL,
+            start_minute INTEGER NOT NULL,
+            end_minute INTEGER NOT NULL
+        )
+    ''')
+    # Dates are stored as YYYY-MM-DD so text order is date order and
+    # "arena between two dates" is a range scan on this index.
+    conn.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_bookings_arena_date_start
+        ON bookings (arena, date, start_minute)
+    ''')
+    conn.commit()
+    fixed = normalize_stored_dates(conn)
+    stats.install_booking_stats(conn)
+    if fixed:
+        stats.rebuild_booking_stats(conn)
+        conn.commit()
+    export.install_change_tracking(conn, 'bookings')
+
+
+def normalize_date(date):
+    # "2024-1-5" -> "2024-01-05". Dates are compared, sorted and grouped into
+    # weeks as text, so this is the only form that goes into the table.
+    try:
+        return datetime.datetime.strptime(date.strip(), "%Y-%m-%d").date().isoformat()
+    except (AttributeError, TypeError, ValueError):
+        raise ValueError(f"Invalid date: {date}") from None
+
+
+def normalize_stored_dates(conn):
+    # Rows written before dates were normalized. The GLOB only reads the
+    # (arena, date, start) index. Returns how many rows were fixed.
+    rows = conn.execute('''
+        SELECT id, date FROM bookings WHERE date NOT GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]'
+    ''').fetchall()
+    fixed = 0
+    for booking_id, date in rows:
+        try:
+            date = normalize_date(date)
+        except ValueError:
+            continue
+        fixed += conn.execute('UPDATE OR IGNORE bookings SET date = ? WHERE id = ?', (date, booking_id)).rowcount
+    conn.commit()
+    return fixed
+
+
+def row_to_event(row):
+    return {"Date": row[2], "Time": format_time_range(row[3], row[4]), "Arena": row[1]}
+
+
+def find_conflict(conn, arena, date, start, end):
+    return conn.execute('''
+        SELECT id, arena, date, start_minute, end_minute FROM bookings
+        WHERE arena = ? AND date = ? AND start_minute < ? AND end_minute > ?
+        LIMIT 1
+    ''', (arena, date, end, start)).fetchone()
+
+
+def insert_booking(conn, arena, date, start, end):
+    # Conflict check + insert, the caller owns the transaction
+    date = normalize_date(date)
+    conflict = find_conflict(conn, arena, date, start, end)
+    if conflict:
+        raise ValueError(f"{arena} is already booked on {date} from {format_time_range(conflict[3], conflict[4])}")
+    cursor = conn.execute('''
+        INSERT INTO bookings (arena, date, start_minute, end_minute) VALUES (?, ?, ?, ?)
+    ''', (arena, date, start, end))
+    return cursor.lastrowid
+
+
+def add_booking(conn, arena, date, start, end):
+    # BEGIN IMMEDIATE takes the write lock before the conflict check, so two
+    # bookers can't both see the slot as free.
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        booking_id = insert_booking(conn, arena, date, start, end)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return booking_id
+
+
+def find_series_conflicts(conn, arenas, dates, start, end):
+    # Bookings clashing with start-end on any of the dates, for all the arenas
+    # in one query. arena IN (...) AND date IN (...) becomes one seek per
+    # (arena, date) pair on the (arena, date, start) index, instead of reading
+    # every booking between the first and last date.
+    # Returns {arena: [(date, start, end), ...]}
+    dates = sorted(set(dates))
+    if not dates or not arenas:
+        return {}
+    conflicts = {}
+    rows = conn.execute(f'''
+        SELECT arena, date, start_minute, end_minute FROM bookings
+        WHERE arena IN ({', '.join('?' * len(arenas))}) AND date IN ({', '.join('?' * len(dates))})
+        AND start_minute < ? AND end_minute > ?
+        ORDER BY arena, date, start_minute
+    ''', [*arenas, *dates, end, start])
+    for arena, date, booked_start, booked_end in rows:
+        conflicts.setdefault(arena, []).append((date, booked_start, booked_end))
+    return conflicts
+
+
+def insert_booking_series(conn, arena, dates, start, end):
+    # Same time on every date, all or nothing. The caller owns the transaction.
+    dates = sorted({normalize_date(date) for date in dates})
+    conflicts = find_series_conflicts(conn, [arena], dates, start, end).get(arena)
+    if conflicts:
+        clashes = ', '.join(f"{date} {format_time_range(booked_start, booked_end)}"
+                            for date, booked_start, booked_end in conflicts[:5])
+        more = f" and {len(conflicts) - 5} more" if len(conflicts) > 5 else ""
+        raise ValueError(f"{arena} is already booked on {clashes}{more}")
+    conn.executemany('''
+        INSERT INTO bookings (arena, date, start_minute, end_minute) VALUES (?, ?, ?, ?)
+    ''', [(arena, date, start, end) for date in dates])
+    return len(dates)
+
+
+def add_booking_series(conn, arena, dates, start, end):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        count = insert_booking_series(conn, arena, dates, start, end)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return count
+
+
+def bookings_query(arena=None, start_date=None, end_date=None, limit=None, after=None):
+    # after: (date, start_minute, id) of the last row of the previous page
+    conditions = []
+    params = []
+    if arena is not None:
+        conditions.append('arena = ?')
+        params.append(arena)
+    if start_date is not None:
+        conditions.append('date >= ?')
+        params.append(start_date)
+    if end_date is not None:
+        conditions.append('date <= ?')
+        params.append(end_date)
+    if after is not None:
+        conditions.append('(date, start_minute, id) > (?, ?, ?)')
+        params.extend(after)
+
+    query = 'SELECT id, arena, date, start_minute, end_minute FROM bookings'
+    if conditions:
+        query += ' WHERE ' + ' AND '.join(conditions)
+    query += ' ORDER BY date, start_minute, id'
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return query, params
+
+
+def read_bookings(conn, arena=None, start_date=None, end_date=None, limit=None, after=None):
+    return conn.execute(*bookings_query(arena, start_date, end_date, limit, after)).fetchall()
+
+
+def iter_bookings(conn, arena=None, start_date=None, end_date=None, batch_size=500):
+    # Same rows as read_bookings, but pulled from the cursor batch by batch
+    # so only what the caller consumes is held in memory.
+    cursor = conn.execute(*bookings_query(arena, start_date, end_date))
+    while True:
+        batch = cursor.fetchmany(batch_size)
+        if not batch:
+            break
+        yield from batch
+
+
+def count_bookings(conn):
+    return conn.execute('SELECT COUNT(*) FROM bookings').fetchone()[0]
+
+
+def has_bookings(conn):
+    return conn.execute('SELECT 1 FROM bookings LIMIT 1').fetchone() is not None
+
+
+def import_events_csv(conn, snapshot_path="events.csv", journal_path="events.journal"):
+    # One-shot migration from the CSV snapshot + journal. Rows that can't be
+    # parsed are skipped, rows already in the table are ignored.
+    rows = []
+    skipped = []
+    for event in load_events(snapshot_path, journal_path):
+        try:
+            start, end = parse_time_range(event["Time"])
+            date = normalize_date(event["Date"])
+        except ValueError:
+            skipped.append(event)
+            continue
+        rows.append((event["Arena"], date, start, end))
+
+    with conn:
+        # rowcount only counts the bookings inserted, total_changes would
+        # include the rows written by the stats and change_log triggers
+        imported = conn.executemany('''
+            INSERT OR IGNORE INTO bookings (arena, date, start_minute, end_minute) VALUES (?, ?, ?, ?)
+        ''', rows).rowcount
+    return imported, skipped
+
+
+if __name__ == "__main__":
+    # python booking_store.py [events.csv] [sports_inventory.db]
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else "events.csv"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else DATABASE
+    conn = connect(db_path)
+    imported, skipped = import_events_csv(conn, csv_path)
+    print(f"Imported {imported} bookings, skipped {len(skipped)} invalid rows")
+    conn.close()
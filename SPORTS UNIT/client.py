@@ -0,0 +1,124 @@
+import json
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+# Talks to server.py. The booking functions mirror booking_store's, so a GUI
+# can use either module with the same calls.
+
+SERVER_URL = 'http://127.0.0.1:8765'
+PAGE_SIZE = 1000  # bookings per request when reading them all
+
+
+class Server:
+    def __init__(self, url=SERVER_URL, timeout=10):
+        self.url = url.rstrip('/')
+        self.timeout = timeout
+
+    def request(self, method, path, body=None, **query):
+        query = {name: value for name, value in query.items() if value is not None}
+        url = self.url + path + ('?' + urlencode(query) if query else '')
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        request = Request(url, data=data, method=method, headers={'Content-Type': 'application/json'})
+        try:
+            with urlopen(request, timeout=self.timeout) as response:
+                payload = response.read()
+        except HTTPError as error:
+            message = json.loads(error.read() or b'{}').get('error', error.reason)
+            if error.code in (400, 409):
+                # Same exception booking_store raises for a clash or bad input
+                raise ValueError(message) from None
+            if error.code == 404:
+                raise LookupError(message) from None
+            raise RuntimeError(f"Server error {error.code}: {message}") from None
+        return json.loads(payload) if payload else None
+
+
+def connect(url=SERVER_URL):
+    return Server(url)
+
+
+# Bookings
+
+def booking_row(booking):
+    return booking['id'], booking['arena'], booking['date'], booking['start_minute'], booking['end_minute']
+
+
+def add_booking(server, arena, date, start, end):
+    return book_with_equipment(server, arena, date, start, end, [])
+
+
+def book_with_equipment(server, arena, date, start, end, items):
+    # items: (equipment_id, quantity) pairs, reserved together with the booking
+    time = f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+    body = {'arena': arena, 'date': date, 'time': time,
+            'equipment': [{'id': equipment_id, 'quantity': quantity} for equipment_id, quantity in items]}
+    return server.request('POST', '/bookings', body)['id']
+
+
+def add_booking_series(server, arena, dates, start, end):
+    time = f"{start // 60:02d}:{start % 60:02d}-{end // 60:02d}:{end % 60:02d}"
+    return server.request('POST', '/bookings/series', {'arena': arena, 'time': time, 'dates': list(dates)})['count']
+
+
+def delete_booking(server, booking_id):
+    try:
+        server.request('DELETE', f'/bookings/{booking_id}')
+    except LookupError:
+        return False
+    return True
+
+
+def read_bookings(server, arena=None, start_date=None, end_date=None, limit=None):
+    if limit is None:
+        return list(iter_bookings(server, arena, start_date, end_date))
+    bookings = server.request('GET', '/bookings', arena=arena, start_date=start_date, end_date=end_date, limit=limit)
+    return [booking_row(booking) for booking in bookings]
+
+
+def iter_bookings(server, arena=None, start_date=None, end_date=None, batch_size=PAGE_SIZE):
+    # The server caps each response, so ask page by page (each one starting
+    # after the last booking seen) until a page comes back empty
+    after = {}
+    while True:
+        bookings = server.request('GET', '/bookings', arena=arena, start_date=start_date, end_date=end_date,
+                                  limit=batch_size, **after)
+        if not bookings:
+            break
+        for booking in bookings:
+            yield booking_row(booking)
+        last = bookings[-1]
+        after = {'after_date': last['date'], 'after_start': last['start_minute'], 'after_id': last['id']}
+
+
+def has_bookings(server):
+    return bool(server.request('GET', '/bookings', limit=1))
+
+
+def free_slots(server, arena, start_date, end_date=None, duration=60, limit=None):
+    return server.request('GET', '/availability', arena=arena, start_date=start_date,
+                          end_date=end_date, duration=duration, limit=limit)
+
+
+# Equipment, rows come back as dicts including the version for updates
+
+def list_equipment(server, after_id=0, limit=None, **filters):
+    return server.request('GET', '/equipment', after_id=after_id, limit=limit, **filters)
+
+
+def get_equipment(server, equipment_id):
+    return server.request('GET', f'/equipment/{equipment_id}')
+
+
+def create_equipment(server, name, equipment, quantity, sport, price):
+    return server.request('POST', '/equipment', {'name': name, 'equipment': equipment, 'quantity': quantity,
+                                                  'sport': sport, 'price': price})
+
+
+def update_equipment(server, equipment_id, name, quantity, sport, version):
+    return server.request('PUT', f'/equipment/{equipment_id}', {'name': name, 'quantity': quantity,
+                                                                 'sport': sport, 'version': version})
+
+
+def delete_equipment(server, equipment_id, version=None):
+    server.request('DELETE', f'/equipment/{equipment_id}', version=version)
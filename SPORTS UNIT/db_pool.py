@@ -0,0 +1,112 @@
+import queue
+import threading
+from contextlib import contextmanager
+
+import db_trace
+
+# One writer connection plus a pool of read-only connections, all on the
+# same database in WAL mode so readers never wait for the writer (or each
+# other). Connections are handed out with context managers and always come
+# back, even when the job raises.
+#
+#   with pool.reader() as conn:       any thread, up to `readers` at once
+#   with pool.writer() as conn:       one thread at a time, autocommit mode,
+#                                     the caller runs BEGIN/COMMIT itself
+#   with pool.transaction() as conn:  writer + BEGIN IMMEDIATE/COMMIT/ROLLBACK
+#   with pool.cursor() as cursor:     a fresh cursor, closed afterwards
+
+READERS = 4
+# Room for every distinct statement the app sends (the search queries vary
+# with the filters used), so they are prepared only once per connection
+CACHED_STATEMENTS = 256
+TIMEOUT = 30
+
+
+class ConnectionPool:
+    def __init__(self, database, readers=READERS, cached_statements=CACHED_STATEMENTS,
+                 synchronous='NORMAL', timeout=TIMEOUT):
+        self.database = database
+        self.max_readers = readers
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self.idle_readers = queue.LifoQueue()
+        self.reader_count = 0
+        self.all_readers = []
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.closed = False
+
+        self.write_conn = self.open(isolation_level=None)
+        self.write_conn.execute('PRAGMA journal_mode=WAL')
+        if synchronous:
+            # NORMAL is still crash safe in WAL mode, it just skips the fsync per commit
+            self.write_conn.execute(f'PRAGMA synchronous={synchronous}')
+
+    def open(self, **kwargs):
+        return db_trace.connect(self.database, timeout=self.timeout, check_same_thread=False,
+                                cached_statements=self.cached_statements, **kwargs)
+
+    def acquire_reader(self):
+        try:
+            return self.idle_readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.closed:
+                raise RuntimeError("ConnectionPool is closed")
+            if self.reader_count < self.max_readers:
+                conn = self.open()
+                conn.execute('PRAGMA query_only=ON')
+                self.reader_count += 1
+                self.all_readers.append(conn)
+                return conn
+        return self.idle_readers.get()
+
+    @contextmanager
+    def reader(self):
+        conn = self.acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            self.idle_readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        with self.write_lock:
+            if self.closed:
+                raise RuntimeError("ConnectionPool is closed")
+            try:
+                yield self.write_conn
+            finally:
+                if self.write_conn.in_transaction:
+                    # the caller left a transaction open, don't let it leak into the next one
+                    self.write_conn.execute('ROLLBACK')
+
+    @contextmanager
+    def transaction(self):
+        with self.writer() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    @contextmanager
+    def cursor(self, write=False):
+        with (self.transaction() if write else self.reader()) as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self):
+        with self.write_lock, self.lock:
+            self.closed = True
+            for conn in self.all_readers:
+                conn.close()
+            self.write_conn.close()
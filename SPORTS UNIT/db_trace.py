@@ -0,0 +1,299 @@
+import functools
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# Optional query instrumentation. Off unless SPORTS_DB_TRACE is set (to the
+# file the results are written to) or enable() is called.
+#
+# Connections opened with connect() while tracing is on time every statement
+# (execute plus fetching its rows), and SQLite's trace callback counts every
+# statement it actually runs (BEGIN/COMMIT included). Queries are grouped by
+# the UI action that caused them, even when they run on the DBExecutor
+# thread. Each distinct SELECT is run through EXPLAIN QUERY PLAN once to spot
+# full table scans, and the same statement repeated many times within one
+# action is reported as a likely N+1.
+#
+# SPORTS_DB_TRACE_FORMAT=chrome writes Chrome trace events (chrome://tracing,
+# Perfetto) instead of the summary report.
+
+TRACE_PATH = os.environ.get('SPORTS_DB_TRACE')
+TRACE_FORMAT = os.environ.get('SPORTS_DB_TRACE_FORMAT', 'report')
+N_PLUS_ONE_THRESHOLD = 10  # same statement this many times in one action
+MAX_EVENTS = 100_000  # cap on the raw events kept for the Chrome trace
+
+
+def normalize(sql):
+    return re.sub(r'\s+', ' ', sql).strip()
+
+
+def is_full_scan(detail):
+    # "SCAN sports_equipment" is a full scan, "SCAN t USING COVERING INDEX",
+    # virtual tables (FTS) and the schema lookups done at startup are not
+    if not detail.startswith('SCAN ') or 'USING' in detail or 'VIRTUAL TABLE' in detail:
+        return False
+    return detail.split()[1] not in ('sqlite_master', 'sqlite_schema')
+
+
+class ActionRecord:
+    def __init__(self, name, number):
+        self.name = name
+        self.number = number
+        self.queries = {}
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.perf_counter()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.statements = {}  # sql -> [count, total seconds, max seconds, rows]
+            self.sqlite_statements = 0
+            self.actions = {}  # name -> [calls, queries, seconds]
+            self.action_count = 0
+            self.plans = {}  # sql -> [plan details]
+            self.full_scans = {}
+            self.n_plus_one = {}
+            self.events = []
+
+    # Actions
+
+    def current_action(self):
+        return getattr(self.local, 'action', None)
+
+    @contextmanager
+    def action(self, name):
+        if not self.enabled:
+            yield None
+            return
+        with self.lock:
+            self.action_count += 1
+            record = ActionRecord(name, self.action_count)
+            stats = self.actions.setdefault(name, [0, 0, 0.0])
+            stats[0] += 1
+        previous = self.current_action()
+        self.local.action = record
+        started = time.perf_counter()
+        try:
+            yield record
+        finally:
+            self.local.action = previous
+            self.add_event(name, 'action', started, time.perf_counter() - started, {'number': record.number})
+
+    def bind(self, job):
+        # Run job (later, on another thread) as part of the current action
+        record = self.current_action()
+        if record is None:
+            return job
+
+        def run(*args):
+            previous = self.current_action()
+            self.local.action = record
+            try:
+                return job(*args)
+            finally:
+                self.local.action = previous
+        return run
+
+    # Statements
+
+    def on_sqlite_statement(self, sql):
+        if self.enabled and not getattr(self.local, 'explaining', False):
+            with self.lock:
+                self.sqlite_statements += 1
+
+    def record(self, sql, seconds, rows=0, started=None):
+        if not self.enabled:
+            return
+        sql = normalize(sql)
+        record = self.current_action()
+        with self.lock:
+            stats = self.statements.setdefault(sql, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += rows
+            if record is not None:
+                action_stats = self.actions[record.name]
+                action_stats[1] += 1
+                action_stats[2] += seconds
+                count = record.queries[sql] = record.queries.get(sql, 0) + 1
+                if count >= N_PLUS_ONE_THRESHOLD:
+                    key = (record.name, sql)
+                    self.n_plus_one[key] = max(self.n_plus_one.get(key, 0), count)
+        if started is not None:
+            self.add_event(sql[:80], 'sql', started, seconds, {'sql': sql, 'action': record and record.name})
+
+    def add_time(self, sql, seconds, rows):
+        # Time spent fetching rows after execute() is added to the statement
+        if not self.enabled:
+            return
+        sql = normalize(sql)
+        record = self.current_action()
+        with self.lock:
+            stats = self.statements.get(sql)
+            if stats is None:
+                return
+            stats[1] += seconds
+            stats[2] = max(stats[2], seconds)
+            stats[3] += rows
+            if record is not None:
+                self.actions[record.name][2] += seconds
+
+    def explain(self, conn, sql, params):
+        key = normalize(sql)
+        if key in self.plans or not key.upper().startswith(('SELECT', 'WITH')):
+            return
+        self.local.explaining = True
+        try:
+            rows = sqlite3.Connection.execute(conn, 'EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+        except sqlite3.Error:
+            rows = []
+        finally:
+            self.local.explaining = False
+        details = [row[3] for row in rows]
+        with self.lock:
+            self.plans[key] = details
+            scans = [detail for detail in details if is_full_scan(detail)]
+            if scans:
+                self.full_scans[key] = scans
+
+    def add_event(self, name, category, started, seconds, args):
+        if not self.enabled:
+            return
+        with self.lock:
+            if len(self.events) < MAX_EVENTS:
+                self.events.append({
+                    'name': name, 'cat': category, 'ph': 'X',
+                    'ts': round((started - self.started) * 1_000_000, 1),
+                    'dur': round(seconds * 1_000_000, 1),
+                    'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args,
+                })
+
+    # Output
+
+    def report(self):
+        with self.lock:
+            statements = sorted(self.statements.items(), key=lambda item: -item[1][1])
+            return {
+                'statements': [{'sql': sql, 'count': count, 'total_ms': round(total * 1000, 3),
+                                'mean_ms': round(total / count * 1000, 3), 'max_ms': round(longest * 1000, 3),
+                                'rows': rows, 'plan': self.plans.get(sql)}
+                               for sql, (count, total, longest, rows) in statements],
+                'sqlite_statements': self.sqlite_statements,
+                'actions': {name: {'calls': calls, 'queries': queries, 'queries_per_call': round(queries / calls, 2),
+                                   'query_ms': round(seconds * 1000, 3)}
+                            for name, (calls, queries, seconds) in sorted(self.actions.items())},
+                'full_scans': [{'sql': sql, 'plan': scans} for sql, scans in self.full_scans.items()],
+                'n_plus_one': [{'action': action, 'sql': sql, 'count': count}
+                               for (action, sql), count in sorted(self.n_plus_one.items())],
+            }
+
+    def chrome_trace(self):
+        with self.lock:
+            return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+    def save(self, path=None, format=None):
+        path = path or TRACE_PATH
+        if not path:
+            return None
+        data = self.chrome_trace() if (format or TRACE_FORMAT) == 'chrome' else self.report()
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, indent=1)
+        return path
+
+
+tracer = Tracer()
+tracer.enabled = bool(TRACE_PATH)
+
+
+class TracedCursor(sqlite3.Cursor):
+    def execute(self, sql, params=()):
+        tracer.explain(self.connection, sql, params)
+        self.traced_sql = sql
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, params)
+        finally:
+            tracer.record(sql, time.perf_counter() - started, started=started)
+
+    def executemany(self, sql, rows):
+        self.traced_sql = sql
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, rows)
+        finally:
+            tracer.record(sql, time.perf_counter() - started, started=started)
+
+    def timed_fetch(self, fetch, *args):
+        started = time.perf_counter()
+        rows = fetch(*args)
+        sql = getattr(self, 'traced_sql', None)
+        if sql is not None:
+            count = len(rows) if isinstance(rows, list) else int(rows is not None)
+            tracer.add_time(sql, time.perf_counter() - started, count)
+        return rows
+
+    def fetchone(self):
+        return self.timed_fetch(super().fetchone)
+
+    def fetchmany(self, size=None):
+        return self.timed_fetch(super().fetchmany, size or self.arraysize)
+
+    def fetchall(self):
+        return self.timed_fetch(super().fetchall)
+
+    def __next__(self):
+        row = self.fetchone()
+        if row is None:
+            raise StopIteration
+        return row
+
+
+class TracedConnection(sqlite3.Connection):
+    # Routes execute() through TracedCursor, which the plain sqlite3
+    # Connection.execute would bypass
+    def cursor(self, factory=TracedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.cursor().executemany(sql, rows)
+
+
+def connect(database, **kwargs):
+    # Same as sqlite3.connect, traced when tracing is switched on
+    if not tracer.enabled:
+        return sqlite3.connect(database, **kwargs)
+    conn = sqlite3.connect(database, factory=TracedConnection, **kwargs)
+    conn.set_trace_callback(tracer.on_sqlite_statement)
+    return conn
+
+
+def enable():
+    # Only connections opened after this are traced
+    tracer.enabled = True
+
+
+def disable():
+    tracer.enabled = False
+
+
+def ui_action(function):
+    # Decorator for GUI handlers: queries they cause are counted under their name
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        with tracer.action(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,194 @@
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db_trace
+from db_pool import ConnectionPool, READERS
+
+READ = 'read'
+WRITE = 'write'
+WORK = 'work'
+
+
+class BatchConnection:
+    # Handed to write jobs instead of the real connection. The executor owns
+    # the transaction, so commit() and "with conn:" are no-ops here.
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql, params)
+
+    def executemany(self, sql, rows):
+        return self.conn.executemany(sql, rows)
+
+    def commit(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class DBExecutor:
+    # Runs database jobs off the Tk thread. A job is a function taking a
+    # connection, its result (or error) is handed back on the Tk thread by
+    # polling with root.after.
+    # Reads run on a few threads with read-only connections from the pool, so
+    # independent reads (the table, the statistics) don't queue behind each
+    # other. Writes go to one writer thread; writes queued back to back are
+    # committed as one transaction, each job inside its own savepoint so one
+    # failure doesn't undo the rest. A read submitted while writes are still
+    # queued goes to the writer thread after them, so it sees their changes.
+    def __init__(self, root, database, poll_interval=50, status_callback=None, readers=READERS):
+        self.root = root
+        self.database = database
+        self.poll_interval = poll_interval
+        self.status_callback = status_callback
+        self.requests = queue.Queue()
+        self.results = queue.Queue()
+        self.pending = 0
+        self.pending_writes = 0
+        self.closed = False
+
+        self.pool = ConnectionPool(database, readers)
+        self.read_threads = ThreadPoolExecutor(readers, thread_name_prefix='db-read')
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.root.after(self.poll_interval, self.poll)
+
+    def read(self, job, callback=None, error_callback=None):
+        self.submit(READ, job, callback, error_callback)
+
+    def write(self, job, callback=None, error_callback=None):
+        self.submit(WRITE, job, callback, error_callback)
+
+    def work(self, job, callback=None, error_callback=None):
+        # Slow work that needs no connection (password hashing), runs on a
+        # reader thread so it never holds the write transaction open
+        self.submit(WORK, lambda conn: job(), callback, error_callback)
+
+    def submit(self, kind, job, callback, error_callback):
+        if self.closed:
+            raise RuntimeError("DBExecutor is closed")
+        self.pending += 1
+        # the job's queries count towards the UI action that submitted it
+        job = db_trace.tracer.bind(job)
+        if kind == WORK:
+            self.read_threads.submit(self.run_read, None, (READ, job, callback, error_callback))
+        elif kind == READ and not self.pending_writes:
+            self.read_threads.submit(self.run_pooled_read, job, callback, error_callback)
+        else:
+            if kind == WRITE:
+                self.pending_writes += 1
+            self.requests.put((kind, job, callback, error_callback))
+        self.report_status()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.requests.put(None)
+            self.thread.join()
+            self.read_threads.shutdown()
+            self.pool.close()
+
+    # Reader threads
+
+    def run_pooled_read(self, job, callback, error_callback):
+        # run_read reports the job's own errors. Failing to get a connection
+        # (pool closed, database can't be opened) goes to error_callback the
+        # same way, so the job is still answered and counted as done.
+        ran = False
+        try:
+            with self.pool.reader() as conn:
+                ran = True
+                self.run_read(conn, (READ, job, callback, error_callback))
+        except Exception as error:
+            if ran:
+                raise
+            self.results.put((READ, callback, error_callback, None, error))
+
+    # Worker thread
+
+    def run(self):
+        held = []
+        while True:
+            request = held.pop() if held else self.requests.get()
+            if request is None:
+                break
+
+            if request[0] == READ:
+                with self.pool.writer() as conn:
+                    self.run_read(conn, request)
+                continue
+
+            batch = [request]
+            while True:
+                try:
+                    request = self.requests.get_nowait()
+                except queue.Empty:
+                    break
+                if request is None or request[0] != WRITE:
+                    held.append(request)
+                    break
+                batch.append(request)
+            with self.pool.writer() as conn:
+                self.run_writes(conn, batch)
+
+    def run_read(self, conn, request):
+        _, job, callback, error_callback = request
+        try:
+            self.results.put((READ, callback, error_callback, job(conn), None))
+        except Exception as error:
+            self.results.put((READ, callback, error_callback, None, error))
+
+    def run_writes(self, conn, batch):
+        outcomes = []
+        batch_conn = BatchConnection(conn)
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for _, job, callback, error_callback in batch:
+                conn.execute('SAVEPOINT job')
+                try:
+                    outcomes.append((WRITE, callback, error_callback, job(batch_conn), None))
+                    conn.execute('RELEASE job')
+                except Exception as error:
+                    conn.execute('ROLLBACK TO job')
+                    conn.execute('RELEASE job')
+                    outcomes.append((WRITE, callback, error_callback, None, error))
+            conn.execute('COMMIT')
+        except sqlite3.Error as error:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            outcomes = [(WRITE, callback, error_callback, None, error) for _, _, callback, error_callback in batch]
+
+        for outcome in outcomes:
+            self.results.put(outcome)
+
+    # Tk thread
+
+    def poll(self):
+        while True:
+            try:
+                kind, callback, error_callback, result, error = self.results.get_nowait()
+            except queue.Empty:
+                break
+            self.pending -= 1
+            if kind == WRITE:
+                self.pending_writes -= 1
+            if error is not None:
+                if error_callback:
+                    error_callback(error)
+            elif callback:
+                callback(result)
+            self.report_status()
+
+        if not self.closed:
+            self.root.after(self.poll_interval, self.poll)
+
+    def report_status(self):
+        if self.status_callback:
+            self.status_callback(self.pending)
@@ -0,0 +1,40 @@
+import csv
+import io
+
+FIELDNAMES = ["Date", "Time", "Arena"]
+
+# Reads the bookings kept before they moved to SQLite: the events.csv
+# snapshot plus the events.journal lines appended after it. Only used by
+# booking_store.import_events_csv, nothing writes these files any more.
+
+
+def load_events(snapshot_path="events.csv", journal_path="events.journal"):
+    return read_snapshot(snapshot_path) + read_journal(journal_path)
+
+
+def read_snapshot(path):
+    try:
+        with open(path, "r", newline="") as file:
+            return [row for row in csv.DictReader(file) if is_complete(row)]
+    except FileNotFoundError:
+        return []
+
+
+def read_journal(path):
+    try:
+        with open(path, "rb") as file:
+            data = file.read()
+    except FileNotFoundError:
+        return []
+
+    # Anything after the last newline is a torn write, leave it out
+    end = data.rfind(b"\n") + 1
+    events = []
+    for row in csv.reader(io.StringIO(data[:end].decode("utf-8"))):
+        if len(row) == len(FIELDNAMES):
+            events.append(dict(zip(FIELDNAMES, row)))
+    return events
+
+
+def is_complete(row):
+    return all(row.get(field) for field in FIELDNAMES)
@@ -0,0 +1,84 @@
+import datetime
+from array import array
+
+from arena_schedule import format_time_range
+
+
+class Booking:
+    # One booking: date as a day ordinal, times as minutes since midnight,
+    # arena as a small code into EventColumns.arena_names
+    __slots__ = ("date", "start", "end", "arena")
+
+    def __init__(self, date, start, end, arena):
+        self.date = date
+        self.start = start
+        self.end = end
+        self.arena = arena
+
+
+class EventColumns:
+    # Column-oriented booking list. Each column is a typed array, so a booking
+    # costs 10 bytes instead of a dict with three strings. Arena names are
+    # stored once and referenced by code.
+    def __init__(self):
+        self.dates = array("i")
+        self.starts = array("H")
+        self.ends = array("H")
+        self.arenas = array("H")
+        self.arena_names = []
+        self.arena_codes = {}
+
+    def arena_code(self, arena):
+        code = self.arena_codes.get(arena)
+        if code is None:
+            code = self.arena_codes[arena] = len(self.arena_names)
+            self.arena_names.append(arena)
+        return code
+
+    def append(self, date, start, end, arena):
+        if isinstance(date, str):
+            date = datetime.date.fromisoformat(date)
+        self.dates.append(date.toordinal())
+        self.starts.append(start)
+        self.ends.append(end)
+        self.arenas.append(self.arena_code(arena))
+
+    def insert_sorted(self, date, start, end, arena):
+        # Keeps the columns ordered by (date, start), returns the new position
+        if isinstance(date, str):
+            date = datetime.date.fromisoformat(date)
+        key = (date.toordinal(), start)
+        low, high = 0, len(self.dates)
+        while low < high:
+            middle = (low + high) // 2
+            if (self.dates[middle], self.starts[middle]) <= key:
+                low = middle + 1
+            else:
+                high = middle
+        self.dates.insert(low, key[0])
+        self.starts.insert(low, start)
+        self.ends.insert(low, end)
+        self.arenas.insert(low, self.arena_code(arena))
+        return low
+
+    def event(self, index):
+        # The {"Date", "Time", "Arena"} dict the GUI shows, built on demand
+        return {
+            "Date": datetime.date.fromordinal(self.dates[index]).isoformat(),
+            "Time": format_time_range(self.starts[index], self.ends[index]),
+            "Arena": self.arena_names[self.arenas[index]],
+        }
+
+    def __len__(self):
+        return len(self.dates)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.event(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.event(index)
@@ -0,0 +1,363 @@
+import argparse
+import csv
+import datetime
+import gzip
+import json
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+
+# Streams sports_equipment and bookings out of SQLite for reporting, batch by
+# batch from the cursor, so memory stays flat whatever the table size.
+#
+# Formats:
+#   npy     one NumPy .npy file per column (numbers, dates as datetime64[D]),
+#           readable with numpy.load(path, mmap_mode='r'). Written directly,
+#           numpy itself is not needed. Text columns are either dictionary
+#           encoded (<col>.codes.npy + <col>.values.json) or stored as
+#           <col>.offsets.npy + <col>.bytes (UTF-8, row i is bytes[offsets[i]:offsets[i+1]]).
+#   csv.gz  one gzip compressed CSV per table
+#
+# Incremental exports: triggers record every insert/update/delete in
+# change_log. A delta export holds the current version of each row changed
+# after the previous export's change_seq, plus the ids deleted since.
+# change_log grows with every write: whoever takes the exports prunes it
+# with prune_changes() once the export is safely written (the command line
+# does this unless --keep-changes is given). A delta from before the pruned
+# point is refused, a full export is needed then.
+
+BATCH_SIZE = 10_000
+FORMATS = ('npy', 'csv.gz')
+EPOCH = datetime.date(1970, 1, 1).toordinal()
+NAT = -2 ** 63  # NumPy's "not a time", for dates that don't parse
+HEADER_SIZE = 128  # fixed so the row count can be filled in at the end
+
+# column -> (numpy dtype, array typecode) or 'dict' / 'text' for strings
+TABLES = {
+    'sports_equipment': [
+        ('id', ('<i8', 'q')),
+        ('name', 'text'),
+        ('equipment', 'dict'),
+        ('quantity', ('<i8', 'q')),
+        ('sport', 'dict'),
+        ('price', ('<f8', 'd')),
+        ('version', ('<i8', 'q')),
+    ],
+    'bookings': [
+        ('id', ('<i8', 'q')),
+        ('arena', 'dict'),
+        ('date', ('<M8[D]', 'q')),
+        ('start_minute', ('<i4', 'i')),
+        ('end_minute', ('<i4', 'i')),
+    ],
+}
+
+
+# Change tracking
+
+def install_change_tracking(conn, table):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log (table_name, seq)')
+    for event, row in (('INSERT', 'new'), ('UPDATE', 'new'), ('DELETE', 'old')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {table}_change_{event.lower()} AFTER {event} ON {table} BEGIN
+                INSERT INTO change_log (table_name, row_id) VALUES ('{table}', {row}.id);
+            END
+        ''')
+    conn.commit()
+
+
+def current_change_seq(conn):
+    row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'change_log'").fetchone()
+    return row[0] if row else 0
+
+
+def prune_changes(conn, up_to_seq):
+    # Once every consumer has an export at up_to_seq the older entries are not needed
+    with conn:
+        return conn.execute('DELETE FROM change_log WHERE seq <= ?', (up_to_seq,)).rowcount
+
+
+def check_changes_kept(conn, since):
+    # Sequence numbers have no gaps, except where prune_changes removed them
+    if since >= current_change_seq(conn):
+        return
+    first = conn.execute('SELECT MIN(seq) FROM change_log').fetchone()[0]
+    if first is None or first > since + 1:
+        raise ValueError(f"Changes after {since} have been pruned, take a full export instead")
+
+
+# .npy writing
+
+class NpyColumn:
+    def __init__(self, path, dtype, typecode):
+        self.file = open(path, 'wb')
+        self.dtype = dtype
+        self.typecode = typecode
+        self.count = 0
+        self.file.write(self.header())
+
+    def header(self):
+        text = f"{{'descr': '{self.dtype}', 'fortran_order': False, 'shape': ({self.count},), }}"
+        text = text.ljust(HEADER_SIZE - 11) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(text)) + text.encode('latin-1')
+
+    def write(self, values):
+        data = array(self.typecode, values)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        data.tofile(self.file)
+        self.count += len(data)
+
+    def close(self):
+        self.file.seek(0)
+        self.file.write(self.header())
+        self.file.close()
+
+
+class DictColumn:
+    # Repeated strings (sport, arena...) as int32 codes into a small value list
+    def __init__(self, directory, name):
+        self.codes = NpyColumn(os.path.join(directory, f"{name}.codes.npy"), '<i4', 'i')
+        self.values_path = os.path.join(directory, f"{name}.values.json")
+        self.index = {}
+
+    def write(self, values):
+        index = self.index
+        self.codes.write([index.setdefault(value, len(index)) for value in values])
+
+    def close(self):
+        self.codes.close()
+        with open(self.values_path, 'w', encoding='utf-8') as file:
+            json.dump(list(self.index), file)
+
+    def describe(self):
+        return {'encoding': 'dict', 'codes': os.path.basename(self.codes.file.name),
+                'values': os.path.basename(self.values_path)}
+
+
+class TextColumn:
+    # Free text (names) as one UTF-8 blob plus int64 offsets, nothing kept in memory
+    def __init__(self, directory, name):
+        self.offsets = NpyColumn(os.path.join(directory, f"{name}.offsets.npy"), '<i8', 'q')
+        self.data = open(os.path.join(directory, f"{name}.bytes"), 'wb')
+        self.position = 0
+        self.offsets.write([0])
+
+    def write(self, values):
+        ends = []
+        for value in values:
+            encoded = (value or '').encode('utf-8')
+            self.data.write(encoded)
+            self.position += len(encoded)
+            ends.append(self.position)
+        self.offsets.write(ends)
+
+    def close(self):
+        self.offsets.close()
+        self.data.close()
+
+    def describe(self):
+        return {'encoding': 'text', 'offsets': os.path.basename(self.offsets.file.name),
+                'data': os.path.basename(self.data.name)}
+
+
+class NumberColumn(NpyColumn):
+    def __init__(self, directory, name, dtype, typecode):
+        super().__init__(os.path.join(directory, f"{name}.npy"), dtype, typecode)
+        self.is_date = dtype.startswith('<M8')
+        self.invalid = 0
+
+    def write(self, values):
+        if self.is_date:
+            values = [date_number(value) for value in values]
+            self.invalid += values.count(NAT)
+        super().write(values)
+
+    def describe(self):
+        info = {'file': os.path.basename(self.file.name), 'dtype': self.dtype}
+        if self.is_date:
+            # rows whose date didn't parse, exported as NaT
+            info['invalid'] = self.invalid
+        return info
+
+
+def date_number(value):
+    try:
+        return datetime.date.fromisoformat(value).toordinal() - EPOCH
+    except (TypeError, ValueError):
+        return NAT
+
+
+def open_column(directory, name, kind):
+    if kind == 'dict':
+        return DictColumn(directory, name)
+    if kind == 'text':
+        return TextColumn(directory, name)
+    return NumberColumn(directory, name, *kind)
+
+
+# Export
+
+def table_query(table, since):
+    names = ', '.join(name for name, _ in TABLES[table])
+    if since is None:
+        return f'SELECT {names} FROM {table} ORDER BY id', ()
+    return f'''
+        SELECT {names} FROM {table}
+        WHERE id IN (SELECT row_id FROM change_log WHERE table_name = ? AND seq > ?)
+        ORDER BY id
+    ''', (table, since)
+
+
+def deleted_ids(conn, table, since):
+    return [row[0] for row in conn.execute(f'''
+        SELECT DISTINCT row_id FROM change_log
+        WHERE table_name = ? AND seq > ? AND row_id NOT IN (SELECT id FROM {table})
+        ORDER BY row_id
+    ''', (table, since))]
+
+
+def export_npy(conn, table, directory, since, batch_size):
+    os.makedirs(directory, exist_ok=True)
+    columns = [open_column(directory, name, kind) for name, kind in TABLES[table]]
+    count = 0
+    cursor = conn.execute(*table_query(table, since))
+    try:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            for column, values in zip(columns, zip(*batch)):
+                column.write(values)
+            count += len(batch)
+    finally:
+        for column in columns:
+            column.close()
+
+    info = {'rows': count, 'columns': {name: column.describe() for (name, _), column in zip(TABLES[table], columns)}}
+    invalid = sum(column.invalid for column in columns if isinstance(column, NumberColumn))
+    if invalid:
+        info['invalid_dates'] = invalid
+    if since is not None:
+        deleted = NpyColumn(os.path.join(directory, 'deleted_id.npy'), '<i8', 'q')
+        deleted.write(deleted_ids(conn, table, since))
+        deleted.close()
+        info['deleted'] = {'file': 'deleted_id.npy', 'rows': deleted.count}
+    return info
+
+
+def export_csv_gz(conn, table, directory, since, batch_size):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{table}.csv.gz")
+    count = 0
+    cursor = conn.execute(*table_query(table, since))
+    with gzip.open(path, 'wt', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow([name for name, _ in TABLES[table]])
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            writer.writerows(batch)
+            count += len(batch)
+
+    info = {'rows': count, 'file': os.path.basename(path)}
+    if since is not None:
+        deleted_path = os.path.join(directory, f"{table}.deleted.csv.gz")
+        ids = deleted_ids(conn, table, since)
+        with gzip.open(deleted_path, 'wt', newline='', encoding='utf-8') as file:
+            file.write('id\n')
+            file.writelines(f"{row_id}\n" for row_id in ids)
+        info['deleted'] = {'file': os.path.basename(deleted_path), 'rows': len(ids)}
+    return info
+
+
+def export_tables(conn, out_dir, format='npy', since=None, tables=None, batch_size=BATCH_SIZE):
+    # since: change_seq of a previous export for a delta, None for everything.
+    # All tables are read inside one transaction, so they match each other
+    # and the change_seq written to the manifest.
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+    tables = tables or [table for table in TABLES
+                        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (table,)).fetchone()]
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        'kind': 'full' if since is None else 'delta',
+        'format': format,
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'since_seq': since,
+        'tables': {},
+    }
+
+    started_transaction = not conn.in_transaction
+    if started_transaction:
+        conn.execute('BEGIN')
+    try:
+        if since is not None:
+            check_changes_kept(conn, since)
+        manifest['change_seq'] = current_change_seq(conn)
+        for table in tables:
+            if format == 'npy':
+                info = export_npy(conn, table, os.path.join(out_dir, table), since, batch_size)
+            else:
+                info = export_csv_gz(conn, table, out_dir, since, batch_size)
+            manifest['tables'][table] = info
+    finally:
+        if started_transaction:
+            conn.rollback()
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
+
+
+def read_manifest(path):
+    if os.path.isdir(path):
+        path = os.path.join(path, 'manifest.json')
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
+
+
+if __name__ == '__main__':
+    import booking_store
+    import inventory
+
+    parser = argparse.ArgumentParser(description="Export equipment and bookings in columnar form")
+    parser.add_argument('out_dir')
+    parser.add_argument('--format', choices=FORMATS, default='npy')
+    parser.add_argument('--since', metavar='EXPORT', help="previous export (directory or manifest.json): only write what changed after it")
+    parser.add_argument('--db', default=inventory.DATABASE)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--keep-changes', action='store_true',
+                        help="don't prune change_log afterwards (other consumers still need older deltas)")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    # brings older databases up to date and starts change tracking on them
+    inventory.create_tables(conn)
+    booking_store.create_bookings_table(conn)
+    since = read_manifest(args.since)['change_seq'] if args.since else None
+    try:
+        manifest = export_tables(conn, args.out_dir, args.format, since, batch_size=args.batch_size)
+    except ValueError as error:
+        sys.exit(f"Export failed: {error}")
+    if not args.keep_changes:
+        # the next delta starts from this export, older entries aren't needed
+        prune_changes(conn, manifest['change_seq'])
+    conn.close()
+    for table, info in manifest['tables'].items():
+        deleted = f", {info['deleted']['rows']} deleted" if 'deleted' in info else ""
+        print(f"{table}: {info['rows']} rows{deleted}")
+        if info.get('invalid_dates'):
+            print(f"Warning: {info['invalid_dates']} {table} rows have a date that isn't YYYY-MM-DD, exported as NaT",
+                  file=sys.stderr)
+    print(f"change_seq {manifest['change_seq']} -> {os.path.join(args.out_dir, 'manifest.json')}")
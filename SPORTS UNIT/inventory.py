@@ -0,0 +1,385 @@
+import sqlite3
+import csv
+import json
+from itertools import islice
+import auth
+import db_trace
+import export
+import stats
+
+# Inventory data layer: equipment, users and roles. No tkinter in here, so it
+# can be imported by the server, batch jobs and benchmarks; sport.py is the GUI.
+
+DATABASE = 'sports_inventory.db'
+
+# The module connection is opened (and the tables created) on first use,
+# not at import time
+conn = None
+
+# Opt-in speed settings. WAL lets readers run during a write and
+# synchronous=NORMAL skips the fsync on every commit (still safe in WAL mode).
+USE_WAL = False
+SYNCHRONOUS = None  # e.g. 'NORMAL' or 'OFF', None keeps the SQLite default
+
+def configure_database(wal=USE_WAL, synchronous=SYNCHRONOUS, db=None):
+    db = db or get_connection()
+    if wal:
+        db.execute('PRAGMA journal_mode=WAL')
+    if synchronous:
+        if synchronous.upper() not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f"Invalid synchronous setting: {synchronous}")
+        db.execute(f'PRAGMA synchronous={synchronous.upper()}')
+
+def get_connection():
+    global conn
+    if conn is None:
+        conn = db_trace.connect(DATABASE)
+        configure_database(db=conn)
+        create_tables(conn)
+    return conn
+
+def close_connection():
+    global conn
+    if conn is not None:
+        conn.close()
+        conn = None
+
+# Create tables if not exists
+def create_tables(db=None):
+    db = db or get_connection()
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS sports_equipment (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            equipment TEXT NOT NULL,
+            quantity INTEGER NOT NULL,
+            sport TEXT NOT NULL,
+            price REAL NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    # Older databases don't have the version column used for optimistic updates
+    columns = [row[1] for row in db.execute('PRAGMA table_info(sports_equipment)')]
+    if 'version' not in columns:
+        db.execute('ALTER TABLE sports_equipment ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+    db.commit()
+
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL
+        )
+    ''')
+    db.commit()
+    auth.create_users_index(db)
+
+    create_search_indexes(db)
+    stats.install_inventory_stats(db)
+    export.install_change_tracking(db, 'sports_equipment')
+
+# Indexes for the search/filter queries, plus an FTS5 table for free text search
+# over name and equipment. FTS5 is optional, without it text search uses LIKE.
+fts_enabled = False
+
+def create_search_indexes(db=None):
+    global fts_enabled
+    db = db or get_connection()
+    db.execute('CREATE INDEX IF NOT EXISTS idx_equipment_sport ON sports_equipment (sport)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_equipment_name ON sports_equipment (name)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_equipment_quantity ON sports_equipment (quantity)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_equipment_price ON sports_equipment (price)')
+
+    exists = db.execute("SELECT 1 FROM sqlite_master WHERE name = 'equipment_fts'").fetchone()
+    try:
+        db.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS equipment_fts
+            USING fts5(name, equipment, content='sports_equipment', content_rowid='id')
+        ''')
+    except sqlite3.OperationalError:
+        db.commit()
+        fts_enabled = False
+        return
+
+    # Keep the FTS index in step with the table
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS equipment_fts_insert AFTER INSERT ON sports_equipment BEGIN
+            INSERT INTO equipment_fts (rowid, name, equipment) VALUES (new.id, new.name, new.equipment);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS equipment_fts_delete AFTER DELETE ON sports_equipment BEGIN
+            INSERT INTO equipment_fts (equipment_fts, rowid, name, equipment) VALUES ('delete', old.id, old.name, old.equipment);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS equipment_fts_update AFTER UPDATE OF name, equipment ON sports_equipment BEGIN
+            INSERT INTO equipment_fts (equipment_fts, rowid, name, equipment) VALUES ('delete', old.id, old.name, old.equipment);
+            INSERT INTO equipment_fts (rowid, name, equipment) VALUES (new.id, new.name, new.equipment);
+        END
+    ''')
+    if not exists:
+        # Index the rows that were there before the FTS table
+        db.execute("INSERT INTO equipment_fts (equipment_fts) VALUES ('rebuild')")
+    db.commit()
+    fts_enabled = True
+    # Refresh planner statistics so it picks these indexes
+    db.execute('PRAGMA optimize')
+
+
+# CRUD operations
+# Each function takes an optional db connection (defaults to the module one),
+# so the same code can run on the DBExecutor worker thread.
+
+def create_equipment(name, equipment, quantity, sport, price, db=None):
+    db = db or get_connection()
+    new_row = db.execute('''
+        INSERT INTO sports_equipment (name, equipment, quantity, sport, price) VALUES (?, ?, ?, ?, ?)
+    ''', (name, equipment, quantity, sport, price))
+    db.commit()
+    return new_row.lastrowid
+
+def read_all_equipment(role=None, db=None):
+    db = db or get_connection()
+    if role == 'admin':
+        return db.execute('''
+            SELECT * FROM sports_equipment
+        ''').fetchall()
+    return db.execute('SELECT equipment, quantity, sport FROM sports_equipment').fetchall()
+
+PAGE_SIZE = 100
+
+def equipment_columns(role=None):
+    # id is always selected so the table can use it as the row key
+    if role == 'admin':
+        return 'id, name, equipment, quantity, sport, price'
+    return 'id, equipment, quantity, sport'
+
+# Full rows including the version, for callers doing optimistic updates
+VERSIONED_COLUMNS = 'id, name, equipment, quantity, sport, price, version'
+
+def read_equipment_page(after_id=0, limit=PAGE_SIZE, role=None, db=None):
+    # Keyset pagination: the primary key index jumps straight to the page,
+    # no matter how deep into the table it is (unlike OFFSET)
+    return (db or get_connection()).execute(f'''
+        SELECT {equipment_columns(role)} FROM sports_equipment WHERE id > ? ORDER BY id LIMIT ?
+    ''', (after_id, limit)).fetchall()
+
+def read_equipment(equipment_id, role=None, db=None):
+    return (db or get_connection()).execute(f'''
+        SELECT {equipment_columns(role)} FROM sports_equipment WHERE id = ?
+    ''', (equipment_id,)).fetchone()
+
+LOW_STOCK_THRESHOLD = stats.LOW_STOCK_THRESHOLD
+
+def fts_query(text):
+    # Every word has to match, as a prefix so results show up while typing
+    words = text.replace('"', ' ').split()
+    return ' '.join(f'"{word}"*' for word in words)
+
+def search_equipment(text=None, sport=None, name_prefix=None, min_price=None, max_price=None,
+                     max_quantity=None, equipment_id=None, after_id=0, limit=PAGE_SIZE, role=None,
+                     columns=None, db=None):
+    # Every filter is optional, each one maps to an indexed column. Results are
+    # paged the same way as read_equipment_page.
+    conditions = ['id > ?']
+    params = [after_id]
+
+    if equipment_id is not None:
+        conditions.append('id = ?')
+        params.append(equipment_id)
+    if sport:
+        conditions.append('sport = ?')
+        params.append(sport)
+    if name_prefix:
+        # A range on the name index instead of LIKE 'x%', which can't use it
+        conditions.append('name >= ? AND name < ?')
+        params += [name_prefix, name_prefix[:-1] + chr(ord(name_prefix[-1]) + 1)]
+    if min_price is not None:
+        conditions.append('price >= ?')
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append('price <= ?')
+        params.append(max_price)
+    if max_quantity is not None:
+        conditions.append('quantity < ?')
+        params.append(max_quantity)
+    if text and text.strip():
+        if fts_enabled:
+            conditions.append('id IN (SELECT rowid FROM equipment_fts WHERE equipment_fts MATCH ?)')
+            params.append(fts_query(text))
+        else:
+            conditions.append('(name LIKE ? OR equipment LIKE ?)')
+            params += [f'%{text.strip()}%', f'%{text.strip()}%']
+
+    params.append(limit)
+    return (db or get_connection()).execute(f'''
+        SELECT {columns or equipment_columns(role)} FROM sports_equipment
+        WHERE {' AND '.join(conditions)} ORDER BY id LIMIT ?
+    ''', params).fetchall()
+
+def update_equipment(equipment_id, name, equipment, quantity, sport, price, db=None):
+    db = db or get_connection()
+    db.execute('''
+        UPDATE sports_equipment SET name = ?, equipment = ?, quantity = ?, sport = ?, price = ?, version = version + 1
+        WHERE id = ?
+    ''', (name, equipment, quantity, sport, price, equipment_id))
+    db.commit()
+
+def delete_equipment(equipment_id, db=None):
+    db = db or get_connection()
+    db.execute('''
+        DELETE FROM sports_equipment WHERE id = ?
+    ''', (equipment_id,))
+    db.commit()
+
+# Optimistic versions: only apply the change if nobody else changed the row
+# since `version` was read. Return False when the version no longer matches.
+
+def update_equipment_if_version(equipment_id, name, quantity, sport, version, db=None):
+    db = db or get_connection()
+    changed = db.execute('''
+        UPDATE sports_equipment SET name = ?, quantity = ?, sport = ?, version = version + 1
+        WHERE id = ? AND version = ?
+    ''', (name, quantity, sport, equipment_id, version)).rowcount
+    db.commit()
+    return changed == 1
+
+def delete_equipment_if_version(equipment_id, version, db=None):
+    db = db or get_connection()
+    changed = db.execute('''
+        DELETE FROM sports_equipment WHERE id = ? AND version = ?
+    ''', (equipment_id, version)).rowcount
+    db.commit()
+    return changed == 1
+
+# Users and passwords are handled by auth.py (hashed, one row per username)
+
+def create_user(username, password, role=None, db=None):
+    # Creates the user or updates their password and role
+    auth.set_user(username, password, role, db or get_connection())
+
+def get_user_role(username, db=None):
+    db = db or get_connection()
+    row = db.execute('SELECT role FROM users WHERE username = ?', (username,)).fetchone()
+    return row[0] if row else None
+
+# Bulk operations, each one runs in a single transaction (one commit for all rows)
+
+EQUIPMENT_FIELDS = ['name', 'equipment', 'quantity', 'sport', 'price']
+BATCH_SIZE = 1000
+
+def create_equipment_many(rows, db=None):
+    # rows: iterable of (name, equipment, quantity, sport, price)
+    db = db or get_connection()
+    with db:
+        db.executemany('''
+            INSERT INTO sports_equipment (name, equipment, quantity, sport, price) VALUES (?, ?, ?, ?, ?)
+        ''', rows)
+
+def update_equipment_many(rows, db=None):
+    # rows: iterable of (equipment_id, name, quantity, sport)
+    db = db or get_connection()
+    with db:
+        db.executemany('''
+            UPDATE sports_equipment SET name = ?, quantity = ?, sport = ?, version = version + 1 WHERE id = ?
+        ''', ((name, quantity, sport, equipment_id) for equipment_id, name, quantity, sport in rows))
+
+def delete_equipment_many(equipment_ids, db=None):
+    db = db or get_connection()
+    with db:
+        db.executemany('''
+            DELETE FROM sports_equipment WHERE id = ?
+        ''', ((equipment_id,) for equipment_id in equipment_ids))
+
+# Streaming import/export. Files are read and written in batches of
+# BATCH_SIZE rows so the whole table is never held in memory.
+
+def read_equipment_file(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            records = (json.loads(line) for line in file if line.strip())
+        else:
+            records = csv.DictReader(file)
+        for record in records:
+            yield (record['name'], record['equipment'], int(record['quantity']),
+                   record['sport'], float(record['price']))
+
+def import_equipment(path, batch_size=BATCH_SIZE, db=None):
+    db = db or get_connection()
+    rows = read_equipment_file(path)
+    count = 0
+    with db:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            db.executemany('''
+                INSERT INTO sports_equipment (name, equipment, quantity, sport, price) VALUES (?, ?, ?, ?, ?)
+            ''', batch)
+            count += len(batch)
+    return count
+
+def export_equipment(path, batch_size=BATCH_SIZE, db=None):
+    db = db or get_connection()
+    fields = ['id'] + EQUIPMENT_FIELDS
+    export_cursor = db.execute('SELECT id, name, equipment, quantity, sport, price FROM sports_equipment ORDER BY id')
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = None if path.endswith('.jsonl') else csv.writer(file)
+        if writer:
+            writer.writerow(fields)
+        while True:
+            batch = export_cursor.fetchmany(batch_size)
+            if not batch:
+                break
+            if writer:
+                writer.writerows(batch)
+            else:
+                file.writelines(json.dumps(dict(zip(fields, row))) + '\n' for row in batch)
+            count += len(batch)
+    return count
+
+# Login session
+
+ROLE_PERMISSIONS = {
+    'admin': {'view_all', 'add_equipment', 'update_equipment', 'delete_equipment'},
+    'student': {'view'},
+}
+
+class UserSession:
+    # Keeps the user's role (the one the login returned, or looked up once)
+    # until invalidate() is called, hits/misses show how often the database was actually asked.
+    def __init__(self, username, role=None):
+        self.username = username
+        self.role = role
+        self.loaded = username is None or role is not None
+        self.hits = 0
+        self.misses = 0
+
+    def get_role(self, db=None):
+        if self.loaded:
+            self.hits += 1
+            return self.role
+
+        self.misses += 1
+        self.set_role(get_user_role(self.username, db))
+        return self.role
+
+    def set_role(self, role):
+        self.role = role
+        self.loaded = True
+
+    def permissions(self):
+        return ROLE_PERMISSIONS.get(self.get_role(), set())
+
+    def has_permission(self, permission):
+        return permission in self.permissions()
+
+    def invalidate(self):
+        self.loaded = self.username is None
+        self.role = None
+
+    def cache_stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
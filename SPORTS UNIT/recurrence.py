@@ -0,0 +1,50 @@
+import datetime
+
+from availability import as_date
+
+# Repeating bookings: every `interval` days (7 = weekly) from start_date up
+# to and including until, skipping the exception dates. Dates are produced
+# on demand, nothing is stored per occurrence.
+
+WEEKLY = 7
+MAX_OCCURRENCES = 1000
+
+
+class RecurrenceRule:
+    def __init__(self, start_date, until, interval=WEEKLY, exceptions=()):
+        self.start_date = as_date(start_date)
+        self.until = as_date(until)
+        self.interval = int(interval)
+        self.exceptions = {as_date(date) for date in exceptions}
+        if self.interval < 1:
+            raise ValueError("Repeat interval must be at least 1 day")
+        if self.until < self.start_date:
+            raise ValueError("Repeat end date is before the first date")
+        if (self.until - self.start_date).days // self.interval + 1 > MAX_OCCURRENCES:
+            raise ValueError(f"A series can have at most {MAX_OCCURRENCES} dates")
+
+    def __iter__(self):
+        # ISO dates, in order
+        step = datetime.timedelta(days=self.interval)
+        day = self.start_date
+        while day <= self.until:
+            if day not in self.exceptions:
+                yield day.isoformat()
+            day += step
+
+    def dates(self):
+        return list(self)
+
+
+def parse_dates(text):
+    # "2024-03-01, 2024-03-08" -> list of dates, for the exception field
+    dates = []
+    for item in text.replace(';', ',').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            dates.append(datetime.date.fromisoformat(item))
+        except ValueError:
+            raise ValueError(f"Invalid date: {item}") from None
+    return dates
@@ -0,0 +1,124 @@
+import datetime
+
+import booking_store
+
+# Equipment reserved for a booking. Stock is taken with a single conditional
+# UPDATE (quantity >= wanted) inside BEGIN IMMEDIATE, so there is no window
+# between checking the stock and taking it, even with several bookers on
+# separate connections. Reservations are handed back when the booking is
+# cancelled or once it has finished.
+
+
+def create_reservations_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS equipment_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            booking_id INTEGER NOT NULL,
+            equipment_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity > 0),
+            released INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reservations_booking
+        ON equipment_reservations (booking_id, released)
+    ''')
+    # release_finished looks for open reservations first
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_reservations_open
+        ON equipment_reservations (released, booking_id)
+    ''')
+    conn.commit()
+
+
+def take_stock(conn, booking_id, items):
+    # items: iterable of (equipment_id, quantity). Caller owns the transaction.
+    for equipment_id, quantity in items:
+        if quantity <= 0:
+            raise ValueError(f"Quantity for equipment {equipment_id} must be positive")
+        taken = conn.execute('''
+            UPDATE sports_equipment SET quantity = quantity - ?, version = version + 1
+            WHERE id = ? AND quantity >= ?
+        ''', (quantity, equipment_id, quantity)).rowcount
+        if taken != 1:
+            raise ValueError(f"Not enough stock of equipment {equipment_id} for {quantity}")
+        conn.execute('''
+            INSERT INTO equipment_reservations (booking_id, equipment_id, quantity) VALUES (?, ?, ?)
+        ''', (booking_id, equipment_id, quantity))
+
+
+def return_stock(conn, booking_id):
+    # Caller owns the transaction. Only reservations not yet released are
+    # returned, so releasing twice is harmless.
+    open_reservations = conn.execute('''
+        SELECT id, equipment_id, quantity FROM equipment_reservations
+        WHERE booking_id = ? AND released = 0
+    ''', (booking_id,)).fetchall()
+    for reservation_id, equipment_id, quantity in open_reservations:
+        conn.execute('UPDATE equipment_reservations SET released = 1 WHERE id = ?', (reservation_id,))
+        conn.execute('''
+            UPDATE sports_equipment SET quantity = quantity + ?, version = version + 1 WHERE id = ?
+        ''', (quantity, equipment_id))
+    return len(open_reservations)
+
+
+def in_transaction(conn, work):
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        result = work()
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
+
+
+def book_with_equipment(conn, arena, date, start, end, items):
+    # The booking and its equipment succeed or fail together
+    items = list(items)
+
+    def work():
+        booking_id = booking_store.insert_booking(conn, arena, date, start, end)
+        take_stock(conn, booking_id, items)
+        return booking_id
+
+    return in_transaction(conn, work)
+
+
+def cancel_booking(conn, booking_id):
+    def work():
+        return_stock(conn, booking_id)
+        return conn.execute('DELETE FROM bookings WHERE id = ?', (booking_id,)).rowcount == 1
+
+    return in_transaction(conn, work)
+
+
+def release_finished(conn, now=None):
+    # Hand back stock for every booking that has ended by `now`
+    now = now or datetime.datetime.now()
+    today = now.date().isoformat()
+    minute = now.hour * 60 + now.minute
+
+    def work():
+        finished = conn.execute('''
+            SELECT DISTINCT r.booking_id FROM equipment_reservations r
+            JOIN bookings b ON b.id = r.booking_id
+            WHERE r.released = 0 AND (b.date < ? OR (b.date = ? AND b.end_minute <= ?))
+        ''', (today, today, minute)).fetchall()
+        return sum(return_stock(conn, booking_id) for (booking_id,) in finished)
+
+    return in_transaction(conn, work)
+
+
+def parse_items(text):
+    # "3:10, 7:2" -> [(3, 10), (7, 2)]  (equipment id : quantity)
+    items = []
+    for part in text.split(','):
+        if not part.strip():
+            continue
+        equipment_id, _, quantity = part.partition(':')
+        try:
+            items.append((int(equipment_id), int(quantity or 1)))
+        except ValueError:
+            raise ValueError(f"Equipment must be written as id:quantity, got {part.strip()!r}")
+    return items
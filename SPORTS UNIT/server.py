@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import json
+import re
+import sqlite3
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+import booking_store
+import inventory
+import reservations
+from arena_schedule import ArenaSchedule, parse_time_range, format_time_range
+from availability import find_free_slots
+
+# Small JSON API over the booking and equipment data, meant to run on
+# localhost so several GUIs can share one database safely.
+#
+# Reads run on a pool of threads, each with its own connection. All writes
+# go through a single writer thread, so they are applied one at a time,
+# and booking inserts still check for overlaps inside BEGIN IMMEDIATE.
+# Equipment updates/deletes carry the row version they were based on and
+# are refused with 409 if somebody changed the row in between.
+
+HOST = '127.0.0.1'
+PORT = 8765
+MAX_BODY = 1024 * 1024
+MAX_ROWS = 5000
+RELEASE_INTERVAL = 60  # seconds between handing back stock of finished bookings
+
+READ = 'read'
+WRITE = 'write'
+
+STATUS_TEXT = {200: 'OK', 201: 'Created', 204: 'No Content', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def field(body, name, convert=str):
+    try:
+        return convert(body[name])
+    except KeyError:
+        raise HTTPError(400, f"Missing field: {name}")
+    except (TypeError, ValueError):
+        raise HTTPError(400, f"Invalid value for {name}")
+
+
+def query_value(query, name, convert=str, default=None):
+    if name not in query:
+        return default
+    try:
+        return convert(query[name])
+    except ValueError:
+        raise HTTPError(400, f"Invalid value for {name}")
+
+
+def limit_value(query, default):
+    # ?limit=..., kept between 1 and MAX_ROWS
+    return max(1, min(query_value(query, 'limit', int, default), MAX_ROWS))
+
+
+def check_date(value):
+    # Returns the date as YYYY-MM-DD, the form stored and compared in bookings
+    try:
+        return booking_store.normalize_date(value)
+    except ValueError:
+        raise HTTPError(400, f"Invalid date: {value}")
+
+
+def booking_json(row):
+    return {'id': row[0], 'arena': row[1], 'date': row[2], 'start_minute': row[3], 'end_minute': row[4],
+            'time': format_time_range(row[3], row[4])}
+
+
+def equipment_json(row):
+    return dict(zip(['id', 'name', 'equipment', 'quantity', 'sport', 'price', 'version'], row))
+
+
+# Handlers: (conn, query, body, *path ids) -> (status, payload)
+
+def list_bookings(conn, query, body):
+    # At most MAX_ROWS per request, the next page starts after the last row:
+    # ?after_date=...&after_start=...&after_id=...
+    start_date = query.get('start_date')
+    end_date = query.get('end_date')
+    after = None
+    if 'after_id' in query:
+        after = (check_date(query.get('after_date')), query_value(query, 'after_start', int, 0),
+                 query_value(query, 'after_id', int, 0))
+    rows = booking_store.read_bookings(conn, query.get('arena'),
+                                       start_date and check_date(start_date), end_date and check_date(end_date),
+                                       limit=limit_value(query, MAX_ROWS), after=after)
+    return 200, [booking_json(row) for row in rows]
+
+
+def create_booking(conn, query, body):
+    arena = field(body, 'arena')
+    date = check_date(field(body, 'date'))
+    try:
+        start, end = parse_time_range(field(body, 'time'))
+    except ValueError as error:
+        raise HTTPError(400, str(error))
+    # optional "equipment": [{"id": 3, "quantity": 10}, ...] reserved with the booking
+    equipment = body.get('equipment') or []
+    if not isinstance(equipment, list) or not all(isinstance(item, dict) for item in equipment):
+        raise HTTPError(400, "equipment must be a list of {id, quantity} objects")
+    items = [(field(item, 'id', int), field(item, 'quantity', int)) for item in equipment]
+    try:
+        booking_id = reservations.book_with_equipment(conn, arena, date, start, end, items)
+    except ValueError as error:
+        raise HTTPError(409, str(error))
+    return 201, booking_json((booking_id, arena, date, start, end))
+
+
+def create_booking_series(conn, query, body):
+    # The same time on each of "dates", booked all together or not at all
+    arena = field(body, 'arena')
+    dates = body.get('dates')
+    if not isinstance(dates, list) or not dates:
+        raise HTTPError(400, "dates must be a non-empty list")
+    if len(dates) > MAX_ROWS:
+        raise HTTPError(400, f"At most {MAX_ROWS} dates per series")
+    dates = [check_date(date) for date in dates]
+    try:
+        start, end = parse_time_range(field(body, 'time'))
+    except ValueError as error:
+        raise HTTPError(400, str(error))
+    try:
+        count = booking_store.add_booking_series(conn, arena, dates, start, end)
+    except ValueError as error:
+        raise HTTPError(409, str(error))
+    return 201, {'arena': arena, 'time': format_time_range(start, end), 'count': count}
+
+
+def remove_booking(conn, query, body, booking_id):
+    if not reservations.cancel_booking(conn, int(booking_id)):
+        raise HTTPError(404, "No such booking")
+    return 204, None
+
+
+def availability(conn, query, body):
+    arena = query.get('arena')
+    if not arena:
+        raise HTTPError(400, "Missing arena")
+    start_date = check_date(query.get('start_date'))
+    end_date = check_date(query.get('end_date', start_date))
+    duration = query_value(query, 'duration', int, 60)
+
+    schedule = ArenaSchedule()
+    for row in booking_store.iter_bookings(conn, arena, start_date, end_date):
+        try:
+            schedule.book(row[1], row[2], format_time_range(row[3], row[4]))
+        except ValueError:
+            pass  # overlapping rows from old imported history
+    try:
+        slots = find_free_slots(schedule, arena, start_date, end_date, duration, limit=limit_value(query, MAX_ROWS))
+    except ValueError as error:
+        raise HTTPError(400, str(error))
+    return 200, [{'date': date, 'time': format_time_range(start, end)} for date, start, end in slots]
+
+
+def list_equipment(conn, query, body):
+    rows = inventory.search_equipment(
+        text=query.get('text'),
+        sport=query.get('sport'),
+        name_prefix=query.get('name_prefix'),
+        min_price=query_value(query, 'min_price', float),
+        max_price=query_value(query, 'max_price', float),
+        max_quantity=query_value(query, 'max_quantity', int),
+        after_id=query_value(query, 'after_id', int, 0),
+        limit=limit_value(query, inventory.PAGE_SIZE),
+        columns=inventory.VERSIONED_COLUMNS,
+        db=conn)
+    return 200, [equipment_json(row) for row in rows]
+
+
+def get_equipment(conn, query, body, equipment_id):
+    rows = inventory.search_equipment(equipment_id=int(equipment_id), limit=1, columns=inventory.VERSIONED_COLUMNS, db=conn)
+    if not rows:
+        raise HTTPError(404, "No such equipment")
+    return 200, equipment_json(rows[0])
+
+
+def add_equipment(conn, query, body):
+    equipment_id = inventory.create_equipment(field(body, 'name'), field(body, 'equipment'), field(body, 'quantity', int),
+                                          field(body, 'sport'), field(body, 'price', float), db=conn)
+    return 201, get_equipment(conn, query, body, equipment_id)[1]
+
+
+def change_equipment(conn, query, body, equipment_id):
+    equipment_id = int(equipment_id)
+    if not inventory.update_equipment_if_version(equipment_id, field(body, 'name'), field(body, 'quantity', int),
+                                             field(body, 'sport'), field(body, 'version', int), db=conn):
+        get_equipment(conn, query, body, equipment_id)  # 404 if it's gone
+        raise HTTPError(409, "Equipment was changed by someone else, reload and try again")
+    return get_equipment(conn, query, body, equipment_id)
+
+
+def remove_equipment(conn, query, body, equipment_id):
+    equipment_id = int(equipment_id)
+    version = query_value(query, 'version', int)
+    if version is None:
+        get_equipment(conn, query, body, equipment_id)
+        inventory.delete_equipment(equipment_id, db=conn)
+    elif not inventory.delete_equipment_if_version(equipment_id, version, db=conn):
+        get_equipment(conn, query, body, equipment_id)
+        raise HTTPError(409, "Equipment was changed by someone else, reload and try again")
+    return 204, None
+
+
+ROUTES = [
+    ('GET', re.compile(r'/bookings'), list_bookings, READ),
+    ('POST', re.compile(r'/bookings'), create_booking, WRITE),
+    ('POST', re.compile(r'/bookings/series'), create_booking_series, WRITE),
+    ('DELETE', re.compile(r'/bookings/(\d+)'), remove_booking, WRITE),
+    ('GET', re.compile(r'/availability'), availability, READ),
+    ('GET', re.compile(r'/equipment'), list_equipment, READ),
+    ('GET', re.compile(r'/equipment/(\d+)'), get_equipment, READ),
+    ('POST', re.compile(r'/equipment'), add_equipment, WRITE),
+    ('PUT', re.compile(r'/equipment/(\d+)'), change_equipment, WRITE),
+    ('DELETE', re.compile(r'/equipment/(\d+)'), remove_equipment, WRITE),
+]
+
+
+class BookingServer:
+    def __init__(self, database=booking_store.DATABASE, readers=4):
+        self.database = database
+        self.local = threading.local()
+        self.read_pool = ThreadPoolExecutor(readers, thread_name_prefix='reader')
+        # One writer thread: writes are serialized without holding up the event loop
+        self.write_pool = ThreadPoolExecutor(1, thread_name_prefix='writer')
+        self.server = None
+
+        conn = self.open_connection()
+        conn.execute('PRAGMA journal_mode=WAL')
+        inventory.create_tables(conn)
+        booking_store.create_bookings_table(conn)
+        reservations.create_reservations_table(conn)
+        conn.close()
+        self.release_task = None
+
+    def open_connection(self):
+        return sqlite3.connect(self.database, timeout=30)
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = self.local.conn = self.open_connection()
+        return conn
+
+    def run_handler(self, handler, query, body, args):
+        try:
+            return handler(self.connection(), query, body, *args)
+        except HTTPError as error:
+            return error.status, {'error': str(error)}
+        except Exception as error:
+            if self.connection().in_transaction:
+                self.connection().rollback()
+            return 500, {'error': str(error)}
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        allowed = False
+        for route_method, pattern, handler, kind in ROUTES:
+            match = pattern.fullmatch(url.path.rstrip('/') or '/')
+            if not match:
+                continue
+            allowed = True
+            if route_method != method:
+                continue
+            try:
+                data = json.loads(body) if body else {}
+            except ValueError:
+                return 400, {'error': "Body must be JSON"}
+            if not isinstance(data, dict):
+                return 400, {'error': "Body must be a JSON object"}
+            pool = self.write_pool if kind == WRITE else self.read_pool
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, self.run_handler, handler, query, data, match.groups())
+        if allowed:
+            return 405, {'error': "Method not allowed"}
+        return 404, {'error': "Not found"}
+
+    async def handle_client(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive, enough for the GUIs and the load test
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get('content-length') or 0)
+                if length > MAX_BODY:
+                    await self.respond(writer, 413, {'error': "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b''
+
+                keep_alive = version == 'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+                status, payload = await self.dispatch(method.upper(), target, body)
+                await self.respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def respond(self, writer, status, payload, keep_alive):
+        data = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(data)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + data)
+        await writer.drain()
+
+    async def release_finished(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self.write_pool, lambda: reservations.release_finished(self.connection()))
+            except Exception:
+                # a locked database or similar, try again next round instead of stopping for good
+                print("Releasing finished reservations failed:", file=sys.stderr)
+                traceback.print_exc()
+            await asyncio.sleep(RELEASE_INTERVAL)
+
+    async def start(self, host=HOST, port=PORT):
+        self.server = await asyncio.start_server(self.handle_client, host, port, backlog=1024)
+        self.release_task = asyncio.create_task(self.release_finished())
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def close(self):
+        if self.release_task:
+            self.release_task.cancel()
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        self.read_pool.shutdown()
+        self.write_pool.shutdown()
+
+
+async def main(host, port, database):
+    server = BookingServer(database)
+    host, port = await server.start(host, port)
+    print(f"Serving {database} on http://{host}:{port}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Booking and inventory JSON server")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--db', default=booking_store.DATABASE)
+    args = parser.parse_args()
+    try:
+        asyncio.run(main(args.host, args.port, args.db))
+    except KeyboardInterrupt:
+        pass
@@ -1,64 +1,16 @@
-import sqlite3
+import bisect
 import tkinter as tk
 from tkinter import ttk, messagebox
+from db_worker import DBExecutor
+from db_trace import ui_action
+import db_trace
+import inventory
+import stats
+from inventory import (PAGE_SIZE, LOW_STOCK_THRESHOLD, UserSession, search_equipment, create_equipment,
+                       update_equipment, delete_equipment, get_user_role)
+from auth import verify_user, store_hash, hash_password, save_user, add_user, user_exists
 
-# Connect to SQLite database
-conn = sqlite3.connect('sports_inventory.db')
-cursor = conn.cursor()
-
-# Create table if not exists
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS sports_equipment (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL,
-        equipment TEXT NOT NULL,
-        quantity INTEGER NOT NULL,
-        sport TEXT NOT NULL,
-        price REAL NOT NULL
-    )
-''')
-conn.commit()
-
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS users (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        username TEXT NOT NULL,
-        password TEXT NOT NULL,
-        role TEXT NOT NULL
-    )
-''')
-conn.commit()
-
-
-# CRUD operations
-
-def create_equipment(name, equipment, quantity, sport, price):
-    cursor.execute('''
-        INSERT INTO sports_equipment (name, equipment, quantity, sport, price) VALUES (?, ?, ?, ?, ?)
-    ''', (name, equipment, quantity, sport, price))
-    conn.commit()
-
-def read_all_equipment(role=None):
-    if role == 'admin':
-        cursor.execute('''
-            SELECT * FROM sports_equipment
-        ''')
-    else:
-        cursor.execute('SELECT equipment, quantity, sport FROM sports_equipment')
-
-    return cursor.fetchall()
-
-def update_equipment(equipment_id, name, quantity, sport):
-    cursor.execute('''
-        UPDATE sports_equipment SET name = ?, quantity = ?, sport = ? WHERE id = ?
-    ''', (name, quantity, sport, equipment_id))
-    conn.commit()
-
-def delete_equipment(equipment_id):
-    cursor.execute('''
-        DELETE FROM sports_equipment WHERE id = ?
-    ''', (equipment_id,))
-    conn.commit()
+# Tk front end for the inventory, the data layer lives in inventory.py
 
 # GUI
 class SportsEquipmentGUI:
@@ -73,6 +25,21 @@ class SportsEquipmentGUI:
 
 #login part
         self.logged_in_user = None
+        self.session = UserSession(None)
+
+        #paging, page_starts holds the id each visited page starts after
+        self.page_size = PAGE_SIZE
+        self.page_starts = [0]
+        self.has_next_page = False
+        self.table_role = None
+        self.page_label = None
+        self.status_label = None
+        self.progress = None
+        self.filters = {}
+        self.filter_job = None
+
+        #database reads and writes run on a worker thread so the window never freezes
+        self.db = DBExecutor(self.root, inventory.DATABASE, status_callback=self.show_db_status)
 
         self.login()
 
@@ -114,6 +81,7 @@ class SportsEquipmentGUI:
         limited_view_window.columnconfigure(2, weight=1)
 
 
+        self.add_filter_bar(limited_view_window)
         self.tree = ttk.Treeview(limited_view_window, columns=('Equipments', 'Quantity Available', 'Sport'), show='headings')
         self.tree.heading('Equipments', text='Equipments')
         self.tree.heading('Quantity Available', text='Quantity Available')
@@ -121,91 +89,89 @@ class SportsEquipmentGUI:
         self.tree.pack(pady=10)
 
         #fetch data
-        limited_data = read_all_equipment(self.get_user_role(self.logged_in_user))  
-
-        for data in limited_data:
-            self.tree.insert('', 'end', values=(data[0], data[1], data[2]))
-
-        self.tree.pack(pady=10)   
-
-    
-    def read_all_equipment_by_role(role=None):
-        if role == 'admin':
-            # Fetch all equipment data for admins
-            cursor.execute('''
-                SELECT id, name, equipment, quantity, sport, price FROM sports_equipment
-            ''')
-        else:
-            # Fetch limited data for non-admin users
-            cursor.execute('SELECT equipment, quantity, sport FROM sports_equipment')
+        self.add_page_buttons(limited_view_window)
+        self.refresh_table()
 
-        return cursor.fetchall()
     
+    @ui_action
     def delete_selected_equipment(self):
         selected_item = self.tree.selection()
         if not selected_item:
             return
         
-        values = self.tree.item(selected_item, 'values')
-        if not values:
-            return
-
-        equipment_id = self.tree.item(selected_item, 'values')[0]
-        delete_equipment(equipment_id)
-        self.refresh_table()
+        equipment_id = int(selected_item[0])
+        self.db.write(lambda db: delete_equipment(equipment_id, db),
+                      lambda _: self.apply_row_change(equipment_id), self.show_db_error)
 
 
     #User authentication and authorization
+    @ui_action
     def create_user(self, username, password, role=None):
-
-        if role is None:
-            role = 'student'
-        
-        # Check if the user already exists
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        existing_user = cursor.fetchone()
-
-        if not existing_user:
-            # If the user doesn't exist, create a new one
-            cursor.execute('''
-                        INSERT INTO users (username, password, role) VALUES (?,?,?)
-                        ''', (username, password, role))
-            conn.commit()
-
-        else:
-            # If the user already exists, update their password and role
-            cursor.execute('UPDATE users SET password = ?, role = ? WHERE username = ?', (password, role, username))
-            conn.commit()
-
-
+        # Hashing the password takes a moment, do it before the write so it
+        # runs off the Tk thread and outside the write transaction
+        self.db.work(lambda: hash_password(password),
+                     lambda password_hash: self.db.write(lambda db: save_user(username, password_hash, role, db),
+                                                         lambda _: self.user_changed(username), self.show_db_error),
+                     self.show_db_error)
+
+    def ensure_user(self, username, password, role):
+        # Creates the account only if it doesn't exist yet (no hashing otherwise)
+        self.db.read(lambda db: user_exists(username, db),
+                     lambda exists: exists or self.create_missing_user(username, password, role), self.show_db_error)
+
+    def create_missing_user(self, username, password, role):
+        self.db.work(lambda: hash_password(password),
+                     lambda password_hash: self.db.write(lambda db: add_user(username, password_hash, role, db),
+                                                         None, self.show_db_error),
+                     self.show_db_error)
+
+    def user_changed(self, username):
+        # The cached role of this user may have changed, read it again on a database thread
+        if self.session.username == username:
+            self.session.invalidate()
+            self.db.read(lambda db: get_user_role(username, db),
+                         lambda role: self.role_changed(username, role), self.show_db_error)
+
+    def role_changed(self, username, role):
+        if self.session.username == username:
+            self.session.set_role(role)
+
+
+    @ui_action
     def check_login(self, login_window, username, password):
-        cursor.execute('''
-            SELECT * FROM users WHERE username = ?  AND password = ?
-                       ''', (username, password))
-        user_data = cursor.fetchone()
-
-        if user_data:
+        # Password checks are slow on purpose (key derivation), run them on a database thread
+        self.db.read(lambda db: verify_user(username, password, db),
+                     lambda result: self.finish_login(login_window, username, *result), self.show_db_error)
+
+    def finish_login(self, login_window, username, role, new_hash):
+        if role is not None:
+            if new_hash:
+                # old plain text or weaker hash, store the new one
+                self.db.write(lambda db: store_hash(username, new_hash, db), None, self.show_db_error)
             login_window.destroy()
             self.logged_in_user = username
+            # verify_user already read the role, no need to ask the database again
+            self.session = UserSession(username, role)
             self.show_main_window()
         else:
             messagebox.showerror("Login Failed", "Invalid username or password")
 
     def get_user_role(self, current_user):
-        cursor.execute('''
-            SELECT role FROM users WHERE username = ?
-        ''', (current_user,))
-        role = cursor.fetchone()
-        return role[0] if role else None
+        if current_user == self.session.username:
+            return self.session.get_role()
+
+        with self.db.pool.reader() as db:
+            return get_user_role(current_user, db)
 
     def show_main_window(self):
         self.root.deiconify()
 
-        if self.logged_in_user and self.get_user_role(self.logged_in_user) == 'admin':
+        if self.logged_in_user and self.session.has_permission('view_all'):
             self.root.title("Sport Equipments Inventory (Admin)")
             self.root.geometry('1500x500')
             
 
+            self.add_filter_bar(self.root)
             self.tree = ttk.Treeview(self.root, columns=('ID', 'Name', 'Equipments', 'Quantity Available', 'Sport', 'Price'), show='headings')
             self.tree.heading('ID', text='ID')
             self.tree.heading('Name', text='Name')
@@ -215,13 +181,16 @@ class SportsEquipmentGUI:
             self.tree.heading('Price', text='Price')
             self.tree.pack(pady=10)
 
-            btn_frame = ttk.Frame(root)
+            btn_frame = ttk.Frame(self.root)
             btn_frame.pack(pady=10)
 
 
             ttk.Button(btn_frame, text="Add Equipment", command=self.show_add_dialog, style='AddButton.TButton').grid(row=0, column=0, padx=5)
             ttk.Button(btn_frame, text="Update Equipment", command=self.show_update_dialog, style='UpdateButton.TButton').grid(row=0, column=1, padx=5)
             ttk.Button(btn_frame, text="Delete Equipment", command=self.delete_selected_equipment, style='DeleteButton.TButton').grid(row=0, column=2, padx=5)
+            ttk.Button(btn_frame, text="Statistics", command=self.show_statistics).grid(row=0, column=3, padx=5)
+
+            self.add_page_buttons(self.root)
         
             for col in self.tree['columns']:
                 self.tree.column(col, width=150)  # Adjust the width as needed
@@ -232,22 +201,18 @@ class SportsEquipmentGUI:
             self.root.title("Limited View")
             self.root.geometry('800x400')
 
+            self.add_filter_bar(self.root)
             self.tree = ttk.Treeview(self.root, columns=('Equipments', 'Quantity Available', 'Sport'), show='headings')
             self.tree.heading('Equipments', text='Equipments')
             self.tree.heading('Quantity Available', text='Quantity Available')
             self.tree.heading('Sport', text='Sport')
 
-            limited_data = read_all_equipment(self.get_user_role(self.logged_in_user))
-
-            for data in limited_data:
-                self.tree.insert('', 'end', values=data)
-
-                self.tree.pack(pady=10)
-
             for col in self.tree['columns']:
                 self.tree.column(col, width=150)  # Adjust the width as needed
 
             self.tree.pack(pady=10)
+            self.add_page_buttons(self.root)
+            self.refresh_table()
 
 
         #Custom sytle for the buttons
@@ -256,17 +221,149 @@ class SportsEquipmentGUI:
         self.root.style.configure('UpdateButton.TButton', bg='#eee8aa')
         self.root.style.configure('DeleteButton.TButton', bg='#ffdab9')
 
+    def add_page_buttons(self, parent):
+        page_frame = ttk.Frame(parent)
+        page_frame.pack(pady=5)
+
+        ttk.Button(page_frame, text="< Previous", command=self.previous_page).grid(row=0, column=0, padx=5)
+        self.page_label = ttk.Label(page_frame, text="Page 1")
+        self.page_label.grid(row=0, column=1, padx=5)
+        ttk.Button(page_frame, text="Next >", command=self.next_page).grid(row=0, column=2, padx=5)
+
+        self.progress = ttk.Progressbar(page_frame, mode='indeterminate', length=100)
+        self.progress.grid(row=0, column=3, padx=5)
+        self.status_label = ttk.Label(page_frame, text="Ready")
+        self.status_label.grid(row=0, column=4, padx=5)
+
+    def add_filter_bar(self, parent):
+        filter_frame = ttk.Frame(parent)
+        filter_frame.pack(pady=5)
+
+        self.search_var = tk.StringVar()
+        self.sport_filter_var = tk.StringVar()
+        self.low_stock_var = tk.BooleanVar()
+
+        ttk.Label(filter_frame, text="Search:").grid(row=0, column=0, padx=5)
+        ttk.Entry(filter_frame, textvariable=self.search_var).grid(row=0, column=1, padx=5)
+        ttk.Label(filter_frame, text="Sport:").grid(row=0, column=2, padx=5)
+        ttk.Entry(filter_frame, textvariable=self.sport_filter_var, width=15).grid(row=0, column=3, padx=5)
+        ttk.Checkbutton(filter_frame, text=f"Low stock (< {LOW_STOCK_THRESHOLD})", variable=self.low_stock_var).grid(row=0, column=4, padx=5)
+
+        for var in (self.search_var, self.sport_filter_var, self.low_stock_var):
+            var.trace_add('write', self.schedule_filter)
+
+    def schedule_filter(self, *args):
+        # Debounce: only query once the user stops typing for a moment
+        if self.filter_job:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(300, self.apply_filter)
+
+    @ui_action
+    def apply_filter(self):
+        self.filter_job = None
+        self.filters = {
+            'text': self.search_var.get(),
+            'sport': self.sport_filter_var.get().strip(),
+            'max_quantity': LOW_STOCK_THRESHOLD if self.low_stock_var.get() else None,
+        }
+        self.page_starts = [0]
+        self.refresh_table()
+
+    def show_db_status(self, pending):
+        if not self.status_label:
+            return
+        if pending:
+            self.status_label.config(text=f"Working... ({pending})")
+            self.progress.start(10)
+        else:
+            self.status_label.config(text="Ready")
+            self.progress.stop()
+
+    @ui_action
+    def show_statistics(self):
+        # Totals come from the trigger maintained stats tables, no table scan
+        self.db.read(lambda db: (stats.inventory_summary(db), stats.sport_stats(db)),
+                     self.show_statistics_result, self.show_db_error)
+
+    def show_statistics_result(self, result):
+        summary, per_sport = result
+        lines = [f"Items: {summary['items']}   Quantity: {summary['quantity']}",
+                 f"Stock value: {summary['stock_value']:.2f}",
+                 f"Low stock (< {LOW_STOCK_THRESHOLD}): {summary['low_stock']}", ""]
+        for sport, (items, quantity, value, low) in per_sport.items():
+            lines.append(f"{sport}: {items} items, {quantity} in stock, value {value:.2f}, {low} low")
+        messagebox.showinfo("Statistics", "\n".join(lines))
+
+    def show_db_error(self, error):
+        messagebox.showerror("Database Error", str(error))
+
+    def row_values(self, row):
+        # Rows always start with the id, only the admin table shows it
+        return row if self.table_role == 'admin' else row[1:]
+
+    @ui_action
     def refresh_table(self):
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-            equipment_list = read_all_equipment(self.get_user_role(self.logged_in_user))  # Pass the role parameter
-        for equipment in equipment_list:
-            if self.get_user_role(self.logged_in_user) == 'admin':
-                self.tree.insert('', 'end', values=(equipment[0], equipment[1], equipment[2], equipment[3], equipment[4], equipment[5]))
-            else:
-                self.tree.insert('', 'end', values=(equipment[1], equipment[2], equipment[3]))
+        # Only the current page is fetched, one extra row tells us if there is a next page
+        self.table_role = self.get_user_role(self.logged_in_user)
+        after_id, limit, role, filters = self.page_starts[-1], self.page_size + 1, self.table_role, dict(self.filters)
+        self.db.read(lambda db: search_equipment(after_id=after_id, limit=limit, role=role, db=db, **filters),
+                     self.show_page, self.show_db_error)
+
+    def show_page(self, rows):
+        self.has_next_page = len(rows) > self.page_size
+
+        self.tree.delete(*self.tree.get_children())
+        for row in rows[:self.page_size]:
+            self.tree.insert('', 'end', iid=str(row[0]), values=self.row_values(row))
+
+        if self.page_label:
+            self.page_label.config(text=f"Page {len(self.page_starts)}")
+
+    @ui_action
+    def next_page(self):
+        children = self.tree.get_children()
+        if not self.has_next_page or not children:
+            return
+        self.page_starts.append(int(children[-1]))
+        self.refresh_table()
+
+    @ui_action
+    def previous_page(self):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+            self.refresh_table()
+
+    @ui_action
+    def apply_row_change(self, equipment_id):
+        # Patch the one row that changed instead of reloading the whole table
+        # (read through the current filters, so a row that stops matching is removed)
+        role, filters = self.table_role, dict(self.filters)
+        self.db.read(lambda db: search_equipment(equipment_id=equipment_id, limit=1, role=role, db=db, **filters),
+                     lambda rows: self.patch_row(equipment_id, rows[0] if rows else None), self.show_db_error)
+
+    def patch_row(self, equipment_id, row):
+        iid = str(equipment_id)
+        if row is None:
+            if self.tree.exists(iid):
+                self.tree.delete(iid)
+            return
+
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.row_values(row))
+            return
+
+        # New row, only show it if its id falls inside the current page
+        page_ids = [int(child) for child in self.tree.get_children()]
+        if equipment_id <= self.page_starts[-1]:
+            return
+        if page_ids and equipment_id > page_ids[-1] and (self.has_next_page or len(page_ids) >= self.page_size):
+            self.has_next_page = True
+            return
 
-        self.tree.pack(pady=10) 
+        self.tree.insert('', bisect.bisect(page_ids, equipment_id), iid=iid, values=self.row_values(row))
+        if len(page_ids) >= self.page_size:
+            self.tree.delete(str(page_ids[-1]))
+            self.has_next_page = True
 
     def show_add_dialog(self):
         add_dialog = tk.Toplevel(self.root)
@@ -298,9 +395,10 @@ class SportsEquipmentGUI:
                                                                       equipment_entry.get(), quantity_entry.get(), 
                                                                       sport_entry.get(), float(price_entry.get()))).grid(row=5, column=1, pady=10)
 
+    @ui_action
     def add_equipment(self, dialog, name, equipment, quantity, sport, price):
-        create_equipment(name, equipment, quantity, sport, price)
-        self.refresh_table()
+        self.db.write(lambda db: create_equipment(name, equipment, quantity, sport, price, db),
+                      self.apply_row_change, self.show_db_error)
         dialog.destroy()
 
     def show_update_dialog(self):
@@ -313,55 +411,67 @@ class SportsEquipmentGUI:
         update_dialog.geometry('300x200')
         update_dialog.configure(bg='#e6e6fa')
 
-        equipment_id = self.tree.item(selected_item, 'values')[0]
+        equipment_id = int(selected_item[0])
+        # start from the row's current values: (id, name, equipment, quantity, sport, price)
+        current = self.tree.item(selected_item[0], 'values')
 
         ttk.Label(update_dialog, text="Name:").grid(row=0, column=0, padx=5, pady=5)
         name_entry = ttk.Entry(update_dialog)
         name_entry.grid(row=0, column=1, padx=5, pady=5)
+        name_entry.insert(0, current[1])
 
         ttk.Label(update_dialog, text="Equipments:").grid(row=1, column=0, padx=5, pady=5)
         equipment_entry = ttk.Entry(update_dialog)                   
         equipment_entry.grid(row=1, column=1, padx=5, pady=5,)
+        equipment_entry.insert(0, current[2])
 
         ttk.Label(update_dialog, text="Quantity Available:").grid(row=2, column=0, padx=5, pady=5)
         quantity_entry = ttk.Entry(update_dialog)
         quantity_entry.grid(row=2, column=1, padx=5, pady=5)
+        quantity_entry.insert(0, current[3])
 
         ttk.Label(update_dialog, text="Sport:").grid(row=3, column=0, padx=5, pady=5)
         sport_entry = ttk.Entry(update_dialog)
         sport_entry.grid(row=3, column=1, padx=5, pady=5)
+        sport_entry.insert(0, current[4])
 
         ttk.Label(update_dialog, text="Price:").grid(row=4, column=0, padx=5, pady=5)
         price_entry = ttk.Entry(update_dialog)                   
         price_entry.grid(row=4, column=1, padx=5, pady=5,)
+        price_entry.insert(0, current[5])
 
-        ttk.Button(update_dialog, text="Update", command=lambda: self.update_equipment(update_dialog, 
-                                                                                      name_entry.get(), equipment_entry.get(),
+        ttk.Button(update_dialog, text="Update", command=lambda: self.update_equipment(update_dialog, equipment_id,
+                                                                                      name_entry.get(),
+                                                                                      equipment_entry.get(),
                                                                                       quantity_entry.get(),
-                                                                                      sport_entry.get(), float(price_entry.get()))).grid(row=5, column=1, pady=10)
+                                                                                      sport_entry.get(),
+                                                                                      float(price_entry.get()))).grid(row=5, column=1, pady=10)
 
-    def update_equipment(self, dialog, equipment_id, name, quantity, sport):
-        update_equipment(equipment_id, name, quantity, sport)
-        self.refresh_table()
+    @ui_action
+    def update_equipment(self, dialog, equipment_id, name, equipment, quantity, sport, price):
+        self.db.write(lambda db: update_equipment(equipment_id, name, equipment, quantity, sport, price, db),
+                      lambda _: self.apply_row_change(equipment_id), self.show_db_error)
         dialog.destroy()
 
     def delete_equipment(self):
-        selected_item = self.tree.selection()
-        if not selected_item:
-            return
+        self.delete_selected_equipment()
 
-        equipment_id = self.tree.item(selected_item, 'values')[0]
-        delete_equipment(equipment_id)
-        self.refresh_table()
+if __name__ == '__main__':
+    # Opens the database and creates the tables
+    inventory.get_connection()
+
+    # Create the main window
+    root = tk.Tk()
+    app = SportsEquipmentGUI(root)
 
-# Create the main window
-root = tk.Tk()
-app = SportsEquipmentGUI(root)
+    #default admin account, only created if it doesn't exist yet
+    app.ensure_user('anis', '497144', 'admin')
 
-#password and username
-app.create_user('anis', '497144', 'admin')
+    root.mainloop()
 
-root.mainloop()
+    # Close the connection when done
+    app.db.close()
+    inventory.close_connection()
 
-# Close the connection when done
-conn.close()
+    # Query timings, when SPORTS_DB_TRACE is set
+    db_trace.tracer.save()
@@ -0,0 +1,181 @@
+import datetime
+
+from availability import OPEN_MINUTE, CLOSE_MINUTE
+
+# Aggregates kept up to date by SQLite triggers, so reading them costs a
+# lookup instead of a scan over the equipment or booking tables.
+#
+#   inventory_stats   per sport: items, total quantity, stock value
+#                     (SUM(quantity * price)) and items below the low stock level
+#   arena_week_usage  per arena and week (keyed by the week's Monday, YYYY-MM-DD):
+#                     bookings and booked minutes
+
+LOW_STOCK_THRESHOLD = 5
+OPEN_MINUTES_PER_WEEK = 7 * (CLOSE_MINUTE - OPEN_MINUTE)
+
+
+def install_inventory_stats(conn, low_stock=LOW_STOCK_THRESHOLD):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stats_settings (
+            name TEXT PRIMARY KEY,
+            value REAL NOT NULL
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO stats_settings (name, value) VALUES ('low_stock', ?)", (low_stock,))
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'inventory_stats'").fetchone()
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS inventory_stats (
+            sport TEXT PRIMARY KEY,
+            item_count INTEGER NOT NULL,
+            total_quantity INTEGER NOT NULL,
+            stock_value REAL NOT NULL,
+            low_stock_count INTEGER NOT NULL
+        )
+    ''')
+
+    low = "(SELECT value FROM stats_settings WHERE name = 'low_stock')"
+    add_new = f'''
+        INSERT INTO inventory_stats (sport, item_count, total_quantity, stock_value, low_stock_count)
+        VALUES (new.sport, 1, new.quantity, new.quantity * new.price, new.quantity < {low})
+        ON CONFLICT (sport) DO UPDATE SET
+            item_count = item_count + 1,
+            total_quantity = total_quantity + excluded.total_quantity,
+            stock_value = stock_value + excluded.stock_value,
+            low_stock_count = low_stock_count + excluded.low_stock_count;
+    '''
+    remove_old = f'''
+        UPDATE inventory_stats SET
+            item_count = item_count - 1,
+            total_quantity = total_quantity - old.quantity,
+            stock_value = stock_value - old.quantity * old.price,
+            low_stock_count = low_stock_count - (old.quantity < {low})
+        WHERE sport = old.sport;
+        DELETE FROM inventory_stats WHERE sport = old.sport AND item_count = 0;
+    '''
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS inventory_stats_insert AFTER INSERT ON sports_equipment BEGIN
+            {add_new}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS inventory_stats_delete AFTER DELETE ON sports_equipment BEGIN
+            {remove_old}
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS inventory_stats_update
+        AFTER UPDATE OF quantity, price, sport ON sports_equipment BEGIN
+            {remove_old}
+            {add_new}
+        END
+    ''')
+    if not exists:
+        rebuild_inventory_stats(conn)
+    conn.commit()
+
+
+def rebuild_inventory_stats(conn):
+    # Full recount, only needed once or after changing the low stock level
+    conn.execute('DELETE FROM inventory_stats')
+    conn.execute('''
+        INSERT INTO inventory_stats (sport, item_count, total_quantity, stock_value, low_stock_count)
+        SELECT sport, COUNT(*), SUM(quantity), SUM(quantity * price),
+               SUM(quantity < (SELECT value FROM stats_settings WHERE name = 'low_stock'))
+        FROM sports_equipment GROUP BY sport
+    ''')
+
+
+def set_low_stock_threshold(conn, low_stock):
+    conn.execute("UPDATE stats_settings SET value = ? WHERE name = 'low_stock'", (low_stock,))
+    rebuild_inventory_stats(conn)
+    conn.commit()
+
+
+# Monday of the week containing `date`, so a week crossing New Year has one key
+WEEK_SQL = "date({}, '-6 days', 'weekday 1')"
+
+
+def install_booking_stats(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'arena_week_usage'").fetchone()
+    old_keys = conn.execute('''
+        SELECT 1 FROM sqlite_master WHERE name = 'arena_week_usage_insert' AND sql LIKE '%strftime%'
+    ''').fetchone()
+    if old_keys:
+        # Older databases keyed weeks by %Y-%W, replace the triggers and recount
+        conn.execute('DROP TRIGGER arena_week_usage_insert')
+        conn.execute('DROP TRIGGER IF EXISTS arena_week_usage_delete')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS arena_week_usage (
+            arena TEXT NOT NULL,
+            week TEXT NOT NULL,
+            bookings INTEGER NOT NULL,
+            booked_minutes INTEGER NOT NULL,
+            PRIMARY KEY (arena, week)
+        )
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS arena_week_usage_insert AFTER INSERT ON bookings BEGIN
+            INSERT INTO arena_week_usage (arena, week, bookings, booked_minutes)
+            VALUES (new.arena, {WEEK_SQL.format('new.date')}, 1, new.end_minute - new.start_minute)
+            ON CONFLICT (arena, week) DO UPDATE SET
+                bookings = bookings + 1,
+                booked_minutes = booked_minutes + excluded.booked_minutes;
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS arena_week_usage_delete AFTER DELETE ON bookings BEGIN
+            UPDATE arena_week_usage SET
+                bookings = bookings - 1,
+                booked_minutes = booked_minutes - (old.end_minute - old.start_minute)
+            WHERE arena = old.arena AND week = {WEEK_SQL.format('old.date')};
+        END
+    ''')
+    if not exists or old_keys:
+        rebuild_booking_stats(conn)
+    conn.commit()
+
+
+def rebuild_booking_stats(conn):
+    # Full recount. Dates that aren't YYYY-MM-DD have no week and are left out.
+    conn.execute('DELETE FROM arena_week_usage')
+    week = WEEK_SQL.format('date')
+    conn.execute(f'''
+        INSERT INTO arena_week_usage (arena, week, bookings, booked_minutes)
+        SELECT arena, {week}, COUNT(*), SUM(end_minute - start_minute)
+        FROM bookings WHERE {week} IS NOT NULL
+        GROUP BY arena, {week}
+    ''')
+
+
+# Reading
+
+def sport_stats(conn):
+    # {sport: (items, total quantity, stock value, low stock items)}
+    rows = conn.execute('''
+        SELECT sport, item_count, total_quantity, stock_value, low_stock_count FROM inventory_stats ORDER BY sport
+    ''').fetchall()
+    return {row[0]: row[1:] for row in rows}
+
+
+def inventory_summary(conn):
+    items, quantity, value, low = conn.execute('''
+        SELECT COALESCE(SUM(item_count), 0), COALESCE(SUM(total_quantity), 0),
+               COALESCE(SUM(stock_value), 0), COALESCE(SUM(low_stock_count), 0)
+        FROM inventory_stats
+    ''').fetchone()
+    return {'items': items, 'quantity': quantity, 'stock_value': round(value, 2), 'low_stock': low}
+
+
+def week_key(date):
+    # Same key as WEEK_SQL: the week's Monday
+    if isinstance(date, str):
+        date = datetime.date.fromisoformat(date)
+    return (date - datetime.timedelta(days=date.weekday())).isoformat()
+
+
+def arena_utilization(conn, arena, date):
+    # Share of the opening hours booked in the week containing `date`
+    row = conn.execute('''
+        SELECT booked_minutes FROM arena_week_usage WHERE arena = ? AND week = ?
+    ''', (arena, week_key(date))).fetchone()
+    return (row[0] if row else 0) / OPEN_MINUTES_PER_WEEK
@@ -0,0 +1,146 @@
+import bisect
+import datetime
+
+PRIORITIES = ["low", "medium", "high"]
+PRIORITY_RANK = {priority: rank for rank, priority in enumerate(PRIORITIES)}
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def search_text(title, description):
+    # "\0" keeps a keyword from matching across the end of the title
+    return f"{title.lower()}\0{description.lower()}"
+
+
+class Task:
+    # No per-instance __dict__, saves memory with lots of tasks loaded
+    __slots__ = ("title", "description", "due_date", "priority", "completed")
+
+    def __init__(self, title, description, due_date, priority):
+        self.title = title
+        self.description = description
+        self.due_date = due_date
+        self.priority = priority
+        self.completed = False
+
+
+class TaskTracker:
+    # Tasks are keyed by title. Next to that we keep:
+    #   due_index        sorted (due_date, seq, title) for date range queries
+    #   priority_buckets priority -> {title: task}, walked high to low
+    #   search_texts     title -> lowercased title + description
+    #   trigram_index    3-character substring -> titles, narrows down searches
+    #   completed_count  kept on complete/delete so statistics don't scan
+    def __init__(self):
+        self.tasks = {}
+        self.due_keys = {}
+        self.due_index = []
+        self.priority_buckets = {priority: {} for priority in PRIORITIES}
+        self.search_texts = {}
+        self.trigram_index = {}
+        self.seq = 0
+        self.completed_count = 0
+
+    def add_task(self, title, description, due_date, priority):
+        priority = priority.lower()
+        if priority not in PRIORITY_RANK:
+            raise ValueError(f"Invalid priority: {priority}")
+        if title in self.tasks:
+            raise ValueError(f"A task called {title!r} already exists")
+
+        task = Task(title, description, due_date, priority)
+        self.tasks[title] = task
+
+        self.seq += 1
+        key = (due_date, self.seq, title)
+        self.due_keys[title] = key
+        bisect.insort(self.due_index, key)
+
+        self.priority_buckets[priority][title] = task
+
+        text = self.search_texts[title] = search_text(title, description)
+        for gram in trigrams(text):
+            self.trigram_index.setdefault(gram, set()).add(title)
+        return task
+
+    def list_tasks(self):
+        for task in self.tasks.values():
+            completed_status = "Completed" if task.completed else "Incomplete"
+            print(f"Title: {task.title}")
+            print(f"Description: {task.description}")
+            print(f"Due Date: {task.due_date}")
+            print(f"Priority: {task.priority}")
+            print(f"Status: {completed_status}")
+            print()
+
+    def get_task(self, title):
+        return self.tasks.get(title)
+
+    def mark_task_complete(self, title):
+        task = self.tasks.get(title)
+        if task and not task.completed:
+            task.completed = True
+            self.completed_count += 1
+        return task
+
+    def delete_task(self, title):
+        task = self.tasks.pop(title, None)
+        if task is None:
+            return None
+        if task.completed:
+            self.completed_count -= 1
+
+        key = self.due_keys.pop(title)
+        index = bisect.bisect_left(self.due_index, key)
+        del self.due_index[index]
+
+        del self.priority_buckets[task.priority][title]
+
+        for gram in trigrams(self.search_texts.pop(title)):
+            titles = self.trigram_index[gram]
+            titles.discard(title)
+            if not titles:
+                del self.trigram_index[gram]
+        return task
+
+    def search_tasks(self, keyword):
+        # Tasks whose title or description contains the keyword (ignoring
+        # case), in the order they were added. Only tasks having every
+        # trigram of the keyword are checked, keywords under 3 characters
+        # check them all.
+        keyword = keyword.lower()
+        grams = sorted(trigrams(keyword), key=lambda gram: len(self.trigram_index.get(gram, ())))
+        if not grams:
+            candidates = self.tasks
+        else:
+            candidates = set(self.trigram_index.get(grams[0], ()))
+            for gram in grams[1:]:
+                if not candidates:
+                    break
+                candidates &= self.trigram_index[gram]
+        matches = [title for title in candidates if keyword in self.search_texts[title]]
+        return [self.tasks[title] for title in sorted(matches, key=lambda title: self.due_keys[title][1])]
+
+    def filter_tasks_due_date(self, start_date, end_date):
+        low = bisect.bisect_left(self.due_index, (start_date,))
+        high = bisect.bisect_right(self.due_index, (end_date, float("inf")))
+        return [self.tasks[key[2]] for key in self.due_index[low:high]]
+
+    def sort_tasks_by_priority(self):
+        # Reorders the tasks in place (list_tasks shows them sorted), high
+        # first, then medium, then low; order of adding within a priority.
+        # Also returns them.
+        ordered = [task for priority in reversed(PRIORITIES) for task in self.priority_buckets[priority].values()]
+        self.tasks = {task.title: task for task in ordered}
+        return ordered
+
+    def get_task_statistics(self):
+        total_tasks = len(self.tasks)
+        completed_tasks = self.completed_count
+        current_date = datetime.datetime.now().date()
+        # everything due up to a week from now (overdue included) sits at the front of due_index
+        tasks_due_within_week = bisect.bisect_right(self.due_index, (current_date + datetime.timedelta(days=7), float("inf")))
+
+        return total_tasks, completed_tasks, tasks_due_within_week
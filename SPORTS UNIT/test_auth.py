@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+import auth
+
+USERS_TABLE = '''
+    CREATE TABLE users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL
+    )
+'''
+
+
+@pytest.fixture(autouse=True)
+def fast_hashing(monkeypatch):
+    monkeypatch.setattr(auth, 'ITERATIONS', 1000)
+    monkeypatch.setattr(auth, 'DUMMY_HASH', None)
+
+
+@pytest.fixture
+def db():
+    db = sqlite3.connect(':memory:')
+    db.execute(USERS_TABLE)
+    auth.create_users_index(db)
+    yield db
+    db.close()
+
+
+def stored_password(db, username):
+    return db.execute('SELECT password FROM users WHERE username = ?', (username,)).fetchone()[0]
+
+
+def test_hash_is_salted_and_checks():
+    first, second = auth.hash_password('secret'), auth.hash_password('secret')
+    assert first != second
+    assert first.startswith('pbkdf2_sha256$1000$')
+    assert auth.check_password('secret', first) == (True, False)
+    assert auth.check_password('wrong', first) == (False, False)
+
+
+def test_verify_user(db):
+    auth.set_user('anis', 'secret', 'admin', db)
+    assert stored_password(db, 'anis') != 'secret'
+    assert auth.verify_user('anis', 'secret', db) == ('admin', None)
+    assert auth.verify_user('anis', 'wrong', db) == (None, None)
+    assert auth.verify_user('nobody', 'secret', db) == (None, None)
+
+
+def test_plain_text_password_is_upgraded(db):
+    db.execute("INSERT INTO users (username, password, role) VALUES ('old', 'secret', 'student')")
+    role, new_hash = auth.verify_user('old', 'secret', db)
+    assert role == 'student'
+    assert new_hash.startswith('pbkdf2_sha256$')
+
+    auth.store_hash('old', new_hash, db)
+    assert stored_password(db, 'old') == new_hash
+    assert auth.verify_user('old', 'secret', db) == ('student', None)
+
+
+def test_weaker_hash_is_upgraded(db, monkeypatch):
+    auth.set_user('anis', 'secret', 'admin', db)
+    monkeypatch.setattr(auth, 'ITERATIONS', 2000)
+    assert auth.authenticate('anis', 'secret', db) == 'admin'
+    assert stored_password(db, 'anis').startswith('pbkdf2_sha256$2000$')
+
+
+def test_set_user_replaces_instead_of_duplicating(db):
+    auth.set_user('anis', 'first', 'student', db)
+    auth.set_user('anis', 'second', 'admin', db)
+    assert db.execute("SELECT COUNT(*) FROM users WHERE username = 'anis'").fetchone()[0] == 1
+    assert auth.authenticate('anis', 'second', db) == 'admin'
+    assert auth.ensure_user('anis', 'third', 'student', db) is False
+    assert auth.add_user('anis', auth.hash_password('third'), 'student', db) is False
+    assert auth.authenticate('anis', 'second', db) == 'admin'
+
+
+def test_create_users_index_keeps_newest_duplicate():
+    db = sqlite3.connect(':memory:')
+    db.execute(USERS_TABLE)
+    db.executemany('INSERT INTO users (username, password, role) VALUES (?, ?, ?)',
+                   [('anis', 'one', 'student'), ('ali', 'pw', 'student'), ('anis', 'two', 'admin')])
+    auth.create_users_index(db)
+
+    assert db.execute('SELECT username, password, role FROM users ORDER BY username').fetchall() == [
+        ('ali', 'pw', 'student'), ('anis', 'two', 'admin')]
+    with pytest.raises(sqlite3.IntegrityError):
+        db.execute("INSERT INTO users (username, password, role) VALUES ('ali', 'x', 'student')")
+
+
+def test_import_users(db):
+    count = auth.import_users([('u1', 'a', None), ('u2', 'b', 'admin'), ('u1', 'c', 'student')], db, workers=2)
+    assert count == 3
+    assert db.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 2
+    assert auth.authenticate('u1', 'c', db) == 'student'
+    assert auth.authenticate('u2', 'b', db) == 'admin'
@@ -0,0 +1,52 @@
+import pytest
+
+from arena_schedule import ArenaSchedule
+from availability import OPEN_MINUTE, find_free_slots, run_starts, week_matrix
+
+
+def test_run_starts_needs_the_whole_run_free():
+    # slots 0-2 and 5-8 free
+    free = 0b111100111
+    assert run_starts(free, 1) == free
+    assert run_starts(free, 3) == 0b001100001
+    assert run_starts(free, 4) == 0b000100000
+    assert run_starts(free, 5) == 0
+
+
+def test_find_free_slots_skips_bookings():
+    schedule = ArenaSchedule()
+    schedule.book("Tennis Court", "2024-03-04", "08:00-10:00")
+    slots = find_free_slots(schedule, "Tennis Court", "2024-03-04", "2024-03-04", 60, limit=2)
+    assert slots == [("2024-03-04", 600, 660), ("2024-03-04", 615, 675)]
+
+
+def test_find_free_slots_spans_days_and_respects_limit():
+    schedule = ArenaSchedule()
+    # the whole first day taken
+    schedule.book("Tennis Court", "2024-03-04", "08:00-22:00")
+    slots = find_free_slots(schedule, "Tennis Court", "2024-03-04", "2024-03-05", 90, limit=1)
+    assert slots == [("2024-03-05", OPEN_MINUTE, OPEN_MINUTE + 90)]
+
+
+def test_find_free_slots_uses_whole_slots():
+    schedule = ArenaSchedule()
+    schedule.book("Tennis Court", "2024-03-04", "08:20-22:00")
+    # 08:15-08:30 is partly booked, only 08:00-08:15 is fully free
+    assert find_free_slots(schedule, "Tennis Court", "2024-03-04", "2024-03-04", 30) == []
+    assert find_free_slots(schedule, "Tennis Court", "2024-03-04", "2024-03-04", 15) == [("2024-03-04", 480, 495)]
+
+
+@pytest.mark.parametrize("duration", [0, -15, 20])
+def test_find_free_slots_rejects_partial_slots(duration):
+    with pytest.raises(ValueError, match="multiple of 15"):
+        find_free_slots(ArenaSchedule(), "Tennis Court", "2024-03-04", "2024-03-04", duration)
+
+
+def test_week_matrix_marks_booked_slots():
+    schedule = ArenaSchedule()
+    schedule.book("Tennis Court", "2024-03-05", "08:00-08:30")
+    matrix = week_matrix(schedule, ["Tennis Court", "Football Field"], "2024-03-04")
+    assert len(matrix) == 14
+    assert all(matrix[("Tennis Court", "2024-03-04")])
+    assert matrix[("Tennis Court", "2024-03-05")][:3] == [False, False, True]
+    assert all(matrix[("Football Field", "2024-03-05")])
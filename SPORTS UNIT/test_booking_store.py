@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+import booking_store
+import stats
+from recurrence import RecurrenceRule
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    booking_store.create_bookings_table(conn)
+    yield conn
+    conn.close()
+
+
+def dates_booked(conn, arena):
+    return [row[0] for row in conn.execute('SELECT date FROM bookings WHERE arena = ? ORDER BY date', (arena,))]
+
+
+def test_find_series_conflicts_per_arena(conn):
+    booking_store.add_booking(conn, "Tennis Court", "2024-03-04", 600, 660)
+    booking_store.add_booking(conn, "Tennis Court", "2024-03-11", 540, 600)  # ends as the series starts
+    booking_store.add_booking(conn, "Football Field", "2024-03-11", 630, 690)
+    booking_store.add_booking(conn, "Football Field", "2024-03-12", 600, 660)  # not one of the dates
+
+    conflicts = booking_store.find_series_conflicts(
+        conn, ["Tennis Court", "Football Field", "Mini Stadium"], ["2024-03-04", "2024-03-11", "2024-03-18"], 600, 660)
+    assert conflicts == {
+        "Tennis Court": [("2024-03-04", 600, 660)],
+        "Football Field": [("2024-03-11", 630, 690)],
+    }
+
+
+def test_series_is_all_or_nothing(conn):
+    booking_store.add_booking(conn, "Tennis Court", "2024-03-18", 630, 690)
+    rule = RecurrenceRule("2024-03-04", "2024-03-25")
+
+    with pytest.raises(ValueError, match="2024-03-18 10:30-11:30"):
+        booking_store.add_booking_series(conn, "Tennis Court", rule.dates(), 600, 660)
+    assert dates_booked(conn, "Tennis Court") == ["2024-03-18"]
+    assert not conn.in_transaction
+
+
+def test_series_books_every_date_once(conn):
+    rule = RecurrenceRule("2024-03-04", "2024-03-25", exceptions=["2024-03-11"])
+    # a repeated date is only booked once
+    count = booking_store.add_booking_series(conn, "Tennis Court", rule.dates() + ["2024-03-04"], 600, 660)
+    assert count == 3
+    assert dates_booked(conn, "Tennis Court") == ["2024-03-04", "2024-03-18", "2024-03-25"]
+    assert conn.execute('SELECT bookings, booked_minutes FROM arena_week_usage WHERE arena = ?',
+                        ("Tennis Court",)).fetchall() == [(1, 60)] * 3
+
+
+def test_series_dates_are_normalized(conn):
+    booking_store.add_booking_series(conn, "Tennis Court", ["2024-3-4", "2024-03-04"], 600, 660)
+    assert dates_booked(conn, "Tennis Court") == ["2024-03-04"]
+    with pytest.raises(ValueError):
+        booking_store.add_booking(conn, "Tennis Court", "2024-03-04", 630, 700)
+
+
+def test_clash_message_lists_first_five(conn):
+    dates = [f"2024-04-{day:02d}" for day in range(1, 8)]
+    for date in dates:
+        booking_store.add_booking(conn, "Tennis Court", date, 600, 660)
+    with pytest.raises(ValueError, match="and 2 more"):
+        booking_store.add_booking_series(conn, "Tennis Court", dates, 600, 660)
+
+
+def test_week_across_new_year_is_one_week(conn):
+    # Monday 2024-12-30 to Sunday 2025-01-05
+    booking_store.add_booking(conn, "Tennis Court", "2024-12-30", 600, 660)
+    booking_store.add_booking(conn, "Tennis Court", "2025-01-01", 600, 660)
+    booking_store.add_booking(conn, "Tennis Court", "2025-01-06", 600, 660)
+    assert stats.week_key("2025-01-05") == "2024-12-30"
+    assert stats.arena_utilization(conn, "Tennis Court", "2025-01-01") == 120 / stats.OPEN_MINUTES_PER_WEEK
+    assert stats.arena_utilization(conn, "Tennis Court", "2024-12-30") == 120 / stats.OPEN_MINUTES_PER_WEEK
+
+    conn.execute('DELETE FROM bookings WHERE date = ?', ("2024-12-30",))
+    assert stats.arena_utilization(conn, "Tennis Court", "2025-01-05") == 60 / stats.OPEN_MINUTES_PER_WEEK
+
+
+def test_old_week_keys_are_recounted(conn):
+    booking_store.add_booking(conn, "Tennis Court", "2025-01-01", 600, 660)
+    # as installed by older versions
+    conn.execute('DROP TRIGGER arena_week_usage_insert')
+    conn.execute('''
+        CREATE TRIGGER arena_week_usage_insert AFTER INSERT ON bookings BEGIN
+            INSERT INTO arena_week_usage (arena, week, bookings, booked_minutes)
+            VALUES (new.arena, strftime('%Y-%W', new.date), 1, new.end_minute - new.start_minute);
+        END
+    ''')
+    conn.execute("UPDATE arena_week_usage SET week = '2025-00'")
+    stats.install_booking_stats(conn)
+    assert conn.execute('SELECT week, bookings FROM arena_week_usage').fetchall() == [("2024-12-30", 1)]
+    assert "strftime" not in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE name = 'arena_week_usage_insert'").fetchone()[0]
@@ -0,0 +1,162 @@
+import ast
+import csv
+import datetime
+import gzip
+import json
+import os
+import sqlite3
+import struct
+from array import array
+
+import pytest
+
+import booking_store
+import export
+import inventory
+
+TYPECODES = {'<i8': 'q', '<f8': 'd', '<i4': 'i', '<M8[D]': 'q'}
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    inventory.create_tables(conn)
+    booking_store.create_bookings_table(conn)
+    conn.executemany('INSERT INTO sports_equipment (name, equipment, quantity, sport, price) VALUES (?, ?, ?, ?, ?)',
+                     [(f"Ball {i} é", 'Ball' if i % 2 else 'Net', i, 'Football' if i % 3 else 'Tennis', 2.5 * i)
+                      for i in range(1, 26)])
+    conn.executemany('INSERT INTO bookings (arena, date, start_minute, end_minute) VALUES (?, ?, ?, ?)',
+                     [('Tennis Court', f"2024-03-{day:02d}", 600, 660) for day in range(1, 11)])
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+def read_npy(path):
+    # Minimal .npy reader, so the tests don't need numpy
+    with open(path, 'rb') as file:
+        data = file.read()
+    assert data[:8] == b'\x93NUMPY\x01\x00'
+    header_length = struct.unpack('<H', data[8:10])[0]
+    assert (10 + header_length) % 64 == 0
+    header = ast.literal_eval(data[10:10 + header_length].decode('latin-1'))
+    values = array(TYPECODES[header['descr']])
+    values.frombytes(data[10 + header_length:])
+    assert len(values) == header['shape'][0]
+    return header['descr'], list(values)
+
+
+def read_table(directory, info):
+    # {column: values} back from an npy export
+    columns = {}
+    for name, column in info['columns'].items():
+        if column.get('encoding') == 'dict':
+            _, codes = read_npy(os.path.join(directory, column['codes']))
+            with open(os.path.join(directory, column['values']), encoding='utf-8') as file:
+                values = json.load(file)
+            columns[name] = [values[code] for code in codes]
+        elif column.get('encoding') == 'text':
+            _, offsets = read_npy(os.path.join(directory, column['offsets']))
+            with open(os.path.join(directory, column['data']), 'rb') as file:
+                data = file.read()
+            columns[name] = [data[start:end].decode('utf-8') for start, end in zip(offsets, offsets[1:])]
+        else:
+            dtype, values = read_npy(os.path.join(directory, column['file']))
+            if dtype == '<M8[D]':
+                values = [datetime.date.fromordinal(export.EPOCH + value).isoformat() for value in values]
+            columns[name] = values
+    return columns
+
+
+def rows_of(columns, names):
+    return list(zip(*(columns[name] for name in names)))
+
+
+def table_rows(conn, table):
+    names = ', '.join(name for name, _ in export.TABLES[table])
+    return conn.execute(f'SELECT {names} FROM {table} ORDER BY id').fetchall()
+
+
+def test_full_npy_round_trip(conn, tmp_path):
+    manifest = export.export_tables(conn, tmp_path, batch_size=7)
+    assert manifest['kind'] == 'full'
+    for table in export.TABLES:
+        info = manifest['tables'][table]
+        columns = read_table(tmp_path / table, info)
+        assert info['rows'] == len(table_rows(conn, table))
+        assert rows_of(columns, [name for name, _ in export.TABLES[table]]) == table_rows(conn, table)
+    assert export.read_manifest(tmp_path) == manifest
+
+
+def test_full_csv_round_trip(conn, tmp_path):
+    export.export_tables(conn, tmp_path, format='csv.gz')
+    with gzip.open(tmp_path / 'bookings.csv.gz', 'rt', newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+    assert rows[0] == ['id', 'arena', 'date', 'start_minute', 'end_minute']
+    assert rows[1:] == [[str(value) for value in row] for row in table_rows(conn, 'bookings')]
+
+
+def test_delta_has_changed_rows_and_deletions(conn, tmp_path):
+    full = export.export_tables(conn, tmp_path / 'full')
+    conn.execute('UPDATE sports_equipment SET quantity = 99 WHERE id IN (3, 7)')
+    conn.execute('DELETE FROM sports_equipment WHERE id = 10')
+    conn.execute("INSERT INTO sports_equipment (name, equipment, quantity, sport, price) VALUES ('New', 'Net', 1, 'Tennis', 1)")
+    conn.execute('DELETE FROM bookings WHERE id = 2')
+    conn.commit()
+
+    delta = export.export_tables(conn, tmp_path / 'delta', since=full['change_seq'])
+    assert delta['kind'] == 'delta'
+    assert delta['since_seq'] == full['change_seq'] < delta['change_seq']
+
+    equipment = delta['tables']['sports_equipment']
+    columns = read_table(tmp_path / 'delta' / 'sports_equipment', equipment)
+    assert columns['id'] == [3, 7, 26]
+    assert columns['quantity'] == [99, 99, 1]
+    assert read_npy(tmp_path / 'delta' / 'sports_equipment' / 'deleted_id.npy')[1] == [10]
+    assert delta['tables']['bookings']['rows'] == 0
+    assert read_npy(tmp_path / 'delta' / 'bookings' / 'deleted_id.npy')[1] == [2]
+
+    # nothing changed since the delta
+    again = export.export_tables(conn, tmp_path / 'again', format='csv.gz', since=delta['change_seq'])
+    assert [info['rows'] for info in again['tables'].values()] == [0, 0]
+    assert [info['deleted']['rows'] for info in again['tables'].values()] == [0, 0]
+
+
+def test_delta_after_prune_is_refused(conn, tmp_path):
+    full = export.export_tables(conn, tmp_path / 'full')
+    conn.execute('UPDATE sports_equipment SET quantity = 1 WHERE id = 1')
+    conn.commit()
+    delta = export.export_tables(conn, tmp_path / 'delta', since=full['change_seq'])
+    export.prune_changes(conn, delta['change_seq'])
+
+    with pytest.raises(ValueError, match="pruned"):
+        export.export_tables(conn, tmp_path / 'old', since=full['change_seq'])
+    # later deltas still work
+    conn.execute('UPDATE sports_equipment SET quantity = 2 WHERE id = 1')
+    conn.commit()
+    latest = export.export_tables(conn, tmp_path / 'latest', since=delta['change_seq'])
+    assert latest['tables']['sports_equipment']['rows'] == 1
+
+
+def test_unparsable_dates_are_counted(tmp_path):
+    # booking_store no longer writes such dates, older databases can have them
+    conn = sqlite3.connect(':memory:')
+    conn.execute('''
+        CREATE TABLE bookings (id INTEGER PRIMARY KEY AUTOINCREMENT, arena TEXT NOT NULL, date TEXT NOT NULL,
+                               start_minute INTEGER NOT NULL, end_minute INTEGER NOT NULL)
+    ''')
+    conn.executemany('INSERT INTO bookings (arena, date, start_minute, end_minute) VALUES (?, ?, ?, ?)',
+                     [('Tennis Court', '2024-03-01', 0, 60), ('Tennis Court', 'someday', 0, 60)])
+    manifest = export.export_tables(conn, tmp_path, tables=['bookings'])
+    info = manifest['tables']['bookings']
+    assert info['invalid_dates'] == 1
+    assert info['columns']['date']['invalid'] == 1
+    assert read_npy(tmp_path / 'bookings' / 'date.npy')[1] == [19783, export.NAT]
+
+
+def test_numpy_can_map_the_columns(conn, tmp_path):
+    numpy = pytest.importorskip('numpy')
+    export.export_tables(conn, tmp_path)
+    dates = numpy.load(tmp_path / 'bookings' / 'date.npy', mmap_mode='r')
+    assert str(dates[0]) == '2024-03-01'
+    assert numpy.load(tmp_path / 'sports_equipment' / 'price.npy', mmap_mode='r').sum() == 2.5 * 325